@@ -13,8 +13,8 @@ QWEN3_MODELS = {
         "max_length": 32768,
         "recommended_batch_size": 32,
         "recommended_lr": 1e-3,
-        "lora_r": 16,
-        "lora_alpha": 32
+        "lora_r": 8,
+        "lora_alpha": 16
     },
     "4B": {
         "base_model": "Qwen/Qwen3-4B",
@@ -23,8 +23,8 @@ QWEN3_MODELS = {
         "max_length": 32768,
         "recommended_batch_size": 16,
         "recommended_lr": 5e-4,
-        "lora_r": 32,
-        "lora_alpha": 64
+        "lora_r": 16,
+        "lora_alpha": 32
     },
     "8B": {
         "base_model": "Qwen/Qwen3-8B",
@@ -33,8 +33,8 @@ QWEN3_MODELS = {
         "max_length": 32768,
         "recommended_batch_size": 8,
         "recommended_lr": 2e-4,
-        "lora_r": 64,
-        "lora_alpha": 128
+        "lora_r": 32,
+        "lora_alpha": 64
     }
 }
 
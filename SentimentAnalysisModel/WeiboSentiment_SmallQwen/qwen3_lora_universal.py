@@ -4,18 +4,21 @@ Qwen3-LoRA通用训练脚本
 支持0.6B、4B、8B三种规模的模型
 """
 import argparse
+import importlib.util
+import json
 import os
+from functools import partial
 import torch
+from torch.nn.utils.rnn import pad_sequence
 from transformers import (
     AutoTokenizer, 
     AutoModelForCausalLM, 
     TrainingArguments, 
-    Trainer,
-    DataCollatorForLanguageModeling
+    Trainer
 )
 from peft import LoraConfig, get_peft_model, TaskType, PeftModel
-from datasets import Dataset
-from typing import List, Tuple
+from datasets import Dataset, Sequence, Value
+from typing import Any, Dict, List, Tuple
 import warnings
 from tqdm import tqdm
 
@@ -24,6 +27,67 @@ from models_config import QWEN3_MODELS, MODEL_PATHS
 
 warnings.filterwarnings("ignore")
 
+# 指令模板：前缀 + 微博文本 + 后缀，模型在后缀之后生成情感标签
+INSTRUCTION_PREFIX = "请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本："
+INSTRUCTION_SUFFIX = "\n\n情感："
+MAX_LENGTH = 512
+# 基础模型只在HuggingFace缓存中时，本地目录记录其来源的文件名
+HF_SOURCE_FILE = "hf_source.json"
+IGNORE_INDEX = -100
+LORA_TARGET_MODULES = ["q_proj", "k_proj", "v_proj", "o_proj", "gate_proj", "up_proj", "down_proj"]
+
+
+def generate_instruction_examples(data: List[Tuple[str, int]]):
+    """逐条产出训练样本：原始文本和情感回答"""
+    for text, label in data:
+        yield {
+            "text": text,
+            "response": "正面" if label == 1 else "负面"
+        }
+
+
+def build_prompt_ids(tokenizer, texts: List[str], prefix_ids: List[int], suffix_ids: List[int],
+                     max_length: int = MAX_LENGTH) -> List[List[int]]:
+    """将文本的token id拼接到指令前后缀之间，文本部分超长时截断"""
+    text_budget = max_length - len(prefix_ids) - len(suffix_ids)
+    text_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [prefix_ids + ids[:text_budget] + suffix_ids for ids in text_ids]
+
+
+def tokenize_examples(examples, tokenizer, prefix_ids: List[int], suffix_ids: List[int]):
+    """分词函数（模块级函数，多进程map时无需序列化整个模型对象）"""
+    response_ids = tokenizer(examples["response"], add_special_tokens=False)["input_ids"]
+    eos_ids = [tokenizer.eos_token_id]
+    
+    # 为回答和eos预留位置，文本部分超长时截断
+    reserved = max(len(ids) for ids in response_ids) + len(eos_ids)
+    prompt_ids = build_prompt_ids(tokenizer, examples["text"], prefix_ids, suffix_ids, MAX_LENGTH - reserved)
+    
+    # 不在这里填充，由整理器按批内最长样本动态填充
+    tokenized = {"input_ids": [], "attention_mask": [], "labels": [], "length": []}
+    for prompt, response in zip(prompt_ids, response_ids):
+        input_ids = prompt + response + eos_ids
+        
+        tokenized["input_ids"].append(input_ids)
+        tokenized["attention_mask"].append([1] * len(input_ids))
+        # 只在回答和eos上计算loss，指令部分用-100屏蔽
+        tokenized["labels"].append([IGNORE_INDEX] * len(prompt) + response + eos_ids)
+        tokenized["length"].append(len(input_ids))
+    
+    return tokenized
+
+
+def pad_collate(features: List[Dict[str, Any]], pad_token_id: int) -> Dict[str, torch.Tensor]:
+    """将一批样本右侧填充到批内最长长度，labels的填充位置为-100"""
+    def pad(key, value):
+        return pad_sequence([torch.as_tensor(f[key]) for f in features], batch_first=True, padding_value=value)
+    
+    return {
+        "input_ids": pad("input_ids", pad_token_id),
+        "attention_mask": pad("attention_mask", 0),
+        "labels": pad("labels", IGNORE_INDEX),
+    }
+
 
 class Qwen3LoRAUniversal(BaseQwenModel):
     """通用Qwen3-LoRA模型"""
@@ -41,6 +105,8 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         self.base_model = None
         self.lora_model = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._prewarmed = False
+        self._merged = False
         
     def _load_base_model(self):
         """加载Qwen3基础模型"""
@@ -48,26 +114,36 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         
         # 第一步：检查当前文件夹的models目录
         local_model_dir = f"./models/qwen3-{self.model_size.lower()}"
-        if os.path.exists(local_model_dir) and os.path.exists(os.path.join(local_model_dir, "config.json")):
+        source_file = os.path.join(local_model_dir, HF_SOURCE_FILE)
+        if os.path.exists(os.path.join(local_model_dir, "config.json")):
             try:
                 print(f"发现本地模型，从本地加载: {local_model_dir}")
                 self.tokenizer = AutoTokenizer.from_pretrained(local_model_dir)
-                self.base_model = AutoModelForCausalLM.from_pretrained(
-                    local_model_dir,
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                    device_map="auto" if torch.cuda.is_available() else None
-                )
+                self.base_model = self._load_causal_lm(local_model_dir)
                 
-                # 设置pad_token
-                if self.tokenizer.pad_token is None:
-                    self.tokenizer.pad_token = self.tokenizer.eos_token
-                    self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+                self._prepare_tokenizer()
                 
                 print(f"从本地模型加载{self.model_size}基础模型成功")
                 return
                 
             except Exception as e:
                 print(f"本地模型加载失败: {e}")
+        elif os.path.exists(source_file):
+            # 本地只记录了HuggingFace缓存中的模型来源，权重直接从缓存加载
+            try:
+                with open(source_file, 'r', encoding='utf-8') as f:
+                    source = json.load(f)
+                print(f"发现本地模型记录，从HuggingFace缓存加载: {source['model_name_hf']}")
+                self.tokenizer = AutoTokenizer.from_pretrained(local_model_dir)
+                self.base_model = self._load_causal_lm(source["model_name_hf"], revision=source.get("revision"))
+                
+                self._prepare_tokenizer()
+                
+                print(f"按本地记录从HuggingFace缓存加载{self.model_size}基础模型成功")
+                return
+                
+            except Exception as e:
+                print(f"按本地记录加载失败: {e}")
         
         # 第二步：检查HuggingFace缓存
         try:
@@ -76,25 +152,22 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             print(f"检查HuggingFace缓存: {cache_path}")
             
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name_hf)
-            self.base_model = AutoModelForCausalLM.from_pretrained(
-                self.model_name_hf,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                device_map="auto" if torch.cuda.is_available() else None
-            )
+            self.base_model = self._load_causal_lm(self.model_name_hf)
             
-            # 设置pad_token
-            if self.tokenizer.pad_token is None:
-                self.tokenizer.pad_token = self.tokenizer.eos_token
-                self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+            self._prepare_tokenizer()
             
             print(f"从HuggingFace缓存加载{self.model_size}基础模型成功")
             
-            # 保存到本地models目录
-            print(f"保存模型到本地: {local_model_dir}")
+            # 权重已在HuggingFace缓存中，本地只保存分词器和模型来源记录，不重复写入权重
+            print(f"记录模型来源到本地: {local_model_dir}")
             os.makedirs(local_model_dir, exist_ok=True)
             self.tokenizer.save_pretrained(local_model_dir)
-            self.base_model.save_pretrained(local_model_dir)
-            print(f"模型已保存到: {local_model_dir}")
+            with open(source_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "model_name_hf": self.model_name_hf,
+                    "revision": getattr(self.base_model.config, "_commit_hash", None)
+                }, f, ensure_ascii=False, indent=2)
+            print(f"模型来源已记录到: {source_file}")
             
         except Exception as e:
             print(f"从HuggingFace缓存加载失败: {e}")
@@ -107,16 +180,9 @@ class Qwen3LoRAUniversal(BaseQwenModel):
                     self.model_name_hf,
                     force_download=True
                 )
-                self.base_model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name_hf,
-                    force_download=True,
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                    device_map="auto" if torch.cuda.is_available() else None
-                )
+                self.base_model = self._load_causal_lm(self.model_name_hf, force_download=True)
                 
-                if self.tokenizer.pad_token is None:
-                    self.tokenizer.pad_token = self.tokenizer.eos_token
-                    self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+                self._prepare_tokenizer()
                 
                 # 保存到本地models目录
                 os.makedirs(local_model_dir, exist_ok=True)
@@ -128,41 +194,48 @@ class Qwen3LoRAUniversal(BaseQwenModel):
                 print(f"从HuggingFace下载也失败: {e2}")
                 raise RuntimeError(f"无法加载{self.model_size}模型，所有方法都失败了")
     
-    def _create_instruction_data(self, data: List[Tuple[str, int]]) -> Dataset:
-        """创建指令格式的训练数据"""
-        instructions = []
+    def _load_causal_lm(self, model_path: str, **kwargs):
+        """加载因果语言模型，注意力实现依次尝试FlashAttention-2、SDPA和eager"""
+        attn_implementations = ["sdpa", "eager"]
+        if torch.cuda.is_available() and importlib.util.find_spec("flash_attn") is not None:
+            attn_implementations.insert(0, "flash_attention_2")
         
-        for text, label in data:
-            sentiment = "正面" if label == 1 else "负面"
-            
-            # 构建指令格式
-            instruction = f"请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本：{text}\n\n情感："
-            response = sentiment
-            
-            
-            # 组合成完整的训练文本
-            full_text = f"{instruction}{response}{self.tokenizer.eos_token}"
-            
-            instructions.append({
-                "instruction": instruction,
-                "response": response,
-                "text": full_text
-            })
-        
-        return Dataset.from_list(instructions)
+        for attn_implementation in attn_implementations:
+            try:
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_path,
+                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+                    device_map="auto" if torch.cuda.is_available() else None,
+                    attn_implementation=attn_implementation,
+                    **kwargs
+                )
+                print(f"注意力实现: {attn_implementation}")
+                return model
+            except (ImportError, ValueError) as e:
+                if attn_implementation == attn_implementations[-1]:
+                    raise
+                print(f"注意力实现 {attn_implementation} 不可用，尝试下一个: {e}")
     
-    def _tokenize_function(self, examples):
-        """分词函数"""
-        tokenized = self.tokenizer(
-            examples["text"],
-            truncation=True,
-            padding="max_length",
-            max_length=512,
-            return_tensors=None
-        )
-        
-        tokenized["labels"] = tokenized["input_ids"].copy()
-        return tokenized
+    def _prepare_tokenizer(self):
+        """设置pad_token并缓存指令模板的token id"""
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+        
+        # 指令前后缀是固定的，只分词一次，之后直接拼接文本的token id
+        self._prefix_ids = self.tokenizer(INSTRUCTION_PREFIX, add_special_tokens=False)["input_ids"]
+        self._suffix_ids = self.tokenizer(INSTRUCTION_SUFFIX, add_special_tokens=False)["input_ids"]
+        # 情感标签的首个token id，预测时直接比对生成的token而不解码
+        self._positive_id = self.tokenizer("正面", add_special_tokens=False)["input_ids"][0]
+        self._negative_id = self.tokenizer("负面", add_special_tokens=False)["input_ids"][0]
+    
+    def _build_prompt_ids(self, texts: List[str], max_length: int = MAX_LENGTH) -> List[List[int]]:
+        """将文本拼接到缓存的指令前后缀之间，返回每条样本的token id"""
+        return build_prompt_ids(self.tokenizer, texts, self._prefix_ids, self._suffix_ids, max_length)
+    
+    def _create_instruction_data(self, data: List[Tuple[str, int]]) -> Dataset:
+        """创建指令格式的训练数据（生成器逐条写入Arrow缓存，不在内存中构建完整列表）"""
+        return Dataset.from_generator(generate_instruction_examples, gen_kwargs={"data": data})
     
     def _setup_lora(self, **kwargs):
         """设置LoRA配置"""
@@ -174,10 +247,13 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             r=lora_r,
             lora_alpha=lora_alpha,
             lora_dropout=kwargs.get('lora_dropout', 0.1),
-            target_modules=["q_proj", "k_proj", "v_proj", "o_proj"],
+            # 注意力和MLP投影层都加LoRA，可传入"all-linear"覆盖所有线性层
+            target_modules=kwargs.get('target_modules', LORA_TARGET_MODULES),
         )
         
         self.lora_model = get_peft_model(self.base_model, lora_config)
+        # 训练时不需要KV缓存，关闭以配合梯度检查点和DDP
+        self.lora_model.config.use_cache = False
         
         # 统计参数
         total_params = sum(p.numel() for p in self.lora_model.parameters())
@@ -214,9 +290,27 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         
         # 分词
         tokenized_dataset = train_dataset.map(
-            self._tokenize_function,
+            tokenize_examples,
             batched=True,
-            remove_columns=train_dataset.column_names
+            batch_size=1000,
+            num_proc=min(8, os.cpu_count() or 1),
+            writer_batch_size=5000,
+            remove_columns=train_dataset.column_names,
+            fn_kwargs={
+                "tokenizer": self.tokenizer,
+                "prefix_ids": self._prefix_ids,
+                "suffix_ids": self._suffix_ids,
+            }
+        )
+        
+        # 以int32 Arrow列存储并直接输出torch张量，整理器无需逐批把Python列表转成张量
+        # labels保持int64，交叉熵要求Long类型目标
+        for column in ("input_ids", "attention_mask"):
+            tokenized_dataset = tokenized_dataset.cast_column(column, Sequence(Value("int32")))
+        tokenized_dataset = tokenized_dataset.with_format(
+            "torch",
+            columns=["input_ids", "attention_mask", "labels"],
+            output_all_columns=True
         )
         
         # 训练参数
@@ -231,13 +325,15 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             save_total_limit=2,
             remove_unused_columns=False,
             dataloader_drop_last=False,
+            dataloader_pin_memory=True,
+            dataloader_num_workers=4,
             report_to=None,
-        )
-        
-        # 数据整理器
-        data_collator = DataCollatorForLanguageModeling(
-            tokenizer=self.tokenizer,
-            mlm=False,
+            # 按长度分桶组批，减少动态填充的pad开销
+            group_by_length=True,
+            length_column_name="length",
+            # 多卡DDP：不查找未使用参数，梯度累积的非最后一步才能走no_sync跳过all_reduce
+            ddp_find_unused_parameters=False,
+            ddp_bucket_cap_mb=50,
         )
         
         # 创建训练器
@@ -245,13 +341,16 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             model=self.lora_model,
             args=training_args,
             train_dataset=tokenized_dataset,
-            data_collator=data_collator,
+            # labels已屏蔽指令部分，不能用会重写labels的语言模型整理器
+            data_collator=partial(pad_collate, pad_token_id=self.tokenizer.pad_token_id),
             tokenizer=self.tokenizer,
         )
         
         # 开始训练
         print(f"开始LoRA微调...")
         trainer.train()
+        # 训练结束后恢复KV缓存，后续生成式预测依赖它
+        self.lora_model.config.use_cache = True
         
         # 保存模型
         self.lora_model.save_pretrained(output_dir)
@@ -259,12 +358,11 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         
         self.model = self.lora_model
         self.is_trained = True
+        self._prewarmed = False
         print(f"Qwen3-{self.model_size}-LoRA 模型训练完成！")
     
-    def _extract_sentiment(self, generated_text: str, instruction: str) -> int:
-        """从生成的文本中提取情感标签"""
-        response = generated_text[len(instruction):].strip()
-        
+    def _extract_sentiment(self, response: str) -> int:
+        """从生成的回答文本中提取情感标签"""
         if "正面" in response:
             return 1
         elif "负面" in response:
@@ -272,7 +370,52 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         else:
             return 0
     
-    def predict(self, texts: List[str]) -> List[int]:
+    def _extract_sentiments(self, new_tokens: torch.Tensor) -> List[int]:
+        """直接在生成的token id上判断情感标签，只对两种标签都未出现的样本解码兜底"""
+        positive = (new_tokens == self._positive_id).any(dim=1)
+        negative = (new_tokens == self._negative_id).any(dim=1)
+        predictions = positive.long().tolist()
+        
+        for i in torch.nonzero(~(positive | negative)).flatten().tolist():
+            response = self.tokenizer.decode(new_tokens[i], skip_special_tokens=True)
+            predictions[i] = self._extract_sentiment(response)
+        
+        return predictions
+    
+    def _build_batch_inputs(self, texts: List[str]) -> Dict[str, torch.Tensor]:
+        """构建批量生成的输入，左侧填充使所有样本从同一位置开始生成"""
+        prompt_ids = self._build_prompt_ids(texts)
+        max_len = max(len(ids) for ids in prompt_ids)
+        pad_id = self.tokenizer.pad_token_id
+        
+        input_ids = torch.tensor([[pad_id] * (max_len - len(ids)) + ids for ids in prompt_ids])
+        attention_mask = torch.tensor([[0] * (max_len - len(ids)) + [1] * len(ids) for ids in prompt_ids])
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if torch.cuda.is_available():
+            # 锁页内存 + 异步拷贝，主机到设备的传输不阻塞默认流
+            inputs = {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in inputs.items()}
+        return inputs
+    
+    def _prewarm(self, batch_size: int = 1):
+        """预热CUDA内核（cublas句柄、注意力内核等），避免首批预测的初始化开销混入预测循环"""
+        if self._prewarmed or not torch.cuda.is_available():
+            return
+        
+        inputs = self._build_batch_inputs(["预热"] * batch_size)
+        
+        with torch.no_grad():
+            for _ in range(2):
+                self.lora_model(**inputs)
+                self.lora_model.generate(
+                    **inputs,
+                    max_new_tokens=1,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                )
+        torch.cuda.synchronize()
+        self._prewarmed = True
+    
+    def predict(self, texts: List[str], batch_size: int = 16) -> List[int]:
         """预测文本情感"""
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练")
@@ -280,25 +423,18 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         predictions = []
         
         self.lora_model.eval()
-        with torch.no_grad():
-            for text in tqdm(texts, desc=f"Qwen3-{self.model_size}预测中"):
-                pred, _ = self.predict_single(text)
-                predictions.append(pred)
+        self._prewarm(min(batch_size, len(texts)) or 1)
+        for i in tqdm(range(0, len(texts), batch_size), desc=f"Qwen3-{self.model_size}预测中"):
+            predictions.extend(self.predict_batch(texts[i:i + batch_size]))
         
         return predictions
     
-    def predict_single(self, text: str) -> Tuple[int, float]:
-        """预测单条文本的情感"""
+    def predict_batch(self, texts: List[str]) -> List[int]:
+        """批量预测文本情感"""
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练")
         
-        # 构建指令
-        instruction = f"请分析以下微博文本的情感倾向，回答'正面'或'负面'。\n\n文本：{text}\n\n情感："
-        
-        # 分词
-        inputs = self.tokenizer(instruction, return_tensors="pt")
-        if torch.cuda.is_available():
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        inputs = self._build_batch_inputs(texts)
         
         # 生成回答
         self.lora_model.eval()
@@ -306,17 +442,18 @@ class Qwen3LoRAUniversal(BaseQwenModel):
             outputs = self.lora_model.generate(
                 **inputs,
                 max_new_tokens=10,
-                do_sample=True,
-                temperature=0.1,
+                do_sample=False,  # 贪心解码：免去采样开销，预测结果可复现
                 pad_token_id=self.tokenizer.pad_token_id,
                 eos_token_id=self.tokenizer.eos_token_id,
             )
         
-        # 解码生成的文本
-        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # 提取情感标签
-        prediction = self._extract_sentiment(generated_text, instruction)
+        # 只取新生成的token，不解码直接提取情感标签
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        return self._extract_sentiments(new_tokens)
+    
+    def predict_single(self, text: str) -> Tuple[int, float]:
+        """预测单条文本的情感"""
+        prediction = self.predict_batch([text])[0]
         confidence = 0.8  # 生成式模型的置信度计算较复杂，这里给个固定值
         
         return prediction, confidence
@@ -326,6 +463,9 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         if not self.is_trained:
             raise ValueError(f"模型 {self.model_name} 尚未训练")
         
+        if self._merged:
+            raise ValueError("LoRA权重已合并到基础模型，请使用 load_model(model_path, merge_lora=False) 加载后再保存")
+        
         if model_path is None:
             model_path = MODEL_PATHS["lora"][self.model_size]
         
@@ -337,8 +477,13 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         
         print(f"LoRA模型已保存到: {model_path}")
     
-    def load_model(self, model_path: str) -> None:
-        """加载模型"""
+    def load_model(self, model_path: str, merge_lora: bool = True) -> None:
+        """加载模型
+        
+        Args:
+            model_path: LoRA权重路径
+            merge_lora: 是否将LoRA权重合并进基础模型（仅用于推理，合并后无法再保存LoRA权重）
+        """
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"模型文件不存在: {model_path}")
         
@@ -348,8 +493,15 @@ class Qwen3LoRAUniversal(BaseQwenModel):
         # 加载LoRA权重
         self.lora_model = PeftModel.from_pretrained(self.base_model, model_path)
         
+        # 推理时把LoRA合并进基础权重，每层只需一次矩阵乘；量化等非浮点权重不合并
+        self._merged = merge_lora and self.base_model.dtype.is_floating_point
+        if self._merged:
+            self.lora_model = self.lora_model.merge_and_unload()
+            print("LoRA权重已合并到基础模型")
+        
         self.model = self.lora_model
         self.is_trained = True
+        self._prewarmed = False
         print(f"已加载Qwen3-{self.model_size}-LoRA模型: {model_path}")
 
 
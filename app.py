@@ -2,21 +2,40 @@
 Flask Main Application - Unified Management of Three Streamlit Applications
 """
 
-import os
 import sys
+
+# eventlet must patch the standard library before threading/requests are imported.
+# Windows pipes cannot be read cooperatively, so keep the threading backend there.
+SOCKETIO_ASYNC_MODE = 'threading'
+if sys.platform != 'win32':
+    try:
+        import eventlet
+        eventlet.monkey_patch()
+        SOCKETIO_ASYNC_MODE = 'eventlet'
+    except ImportError:
+        pass
+
+import os
+import re
+import hashlib
 import subprocess
 import time
 import threading
 from datetime import datetime
-from queue import Queue
-from flask import Flask, render_template, request, jsonify, Response
+from queue import Queue, Empty
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO, emit
 import atexit
 import requests
+from requests.adapters import HTTPAdapter
 from loguru import logger
 import importlib
 from pathlib import Path
 from MindSpider.main import MindSpider
+from utils.forum_reader import read_tail_lines
 
 # Import ReportEngine
 try:
@@ -26,9 +45,64 @@ except ImportError as e:
     logger.error(f"Failed to import ReportEngine: {e}")
     REPORT_ENGINE_AVAILABLE = False
 
+# Import ForumEngine monitor entry points once; fall back to a lazy import on first use
+try:
+    from ForumEngine.monitor import start_forum_monitoring, stop_forum_monitoring
+except Exception as e:
+    logger.error(f"Failed to import ForumEngine monitor: {e}")
+    start_forum_monitoring = stop_forum_monitoring = None
+
+
+def _forum_monitor_functions():
+    """Return (start_forum_monitoring, stop_forum_monitoring), importing ForumEngine.monitor if needed."""
+    global start_forum_monitoring, stop_forum_monitoring
+    if start_forum_monitoring is None or stop_forum_monitoring is None:
+        monitor = importlib.import_module('ForumEngine.monitor')
+        start_forum_monitoring = monitor.start_forum_monitoring
+        stop_forum_monitoring = monitor.stop_forum_monitoring
+    return start_forum_monitoring, stop_forum_monitoring
+
+# Use orjson for JSON encoding when available (much faster than stdlib json on small payloads)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _OrjsonJSON:
+    """Minimal json-module adapter around orjson for python-socketio."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+class OrjsonJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; types orjson cannot encode go through Flask's default handler."""
+
+    def dumps(self, obj, **kwargs):
+        # Datetimes go through Flask's handler to keep its HTTP date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'Dedicated-to-creating-a-concise-and-versatile-public-opinion-analysis-platform'
-socketio = SocketIO(app, cors_allowed_origins="*")
+if orjson is not None:
+    app.json = OrjsonJSONProvider(app)
+socketio_options = {'json': _OrjsonJSON} if orjson is not None else {}
+socketio = SocketIO(app, async_mode=SOCKETIO_ASYNC_MODE, cors_allowed_origins="*", **socketio_options)
 
 # Register ReportEngine Blueprint
 if REPORT_ENGINE_AVAILABLE:
@@ -45,6 +119,20 @@ os.environ['PYTHONUTF8'] = '1'
 LOG_DIR = Path('logs')
 LOG_DIR.mkdir(exist_ok=True)
 
+# (epoch second, formatted HH:MM:SS) of the last console timestamp
+_hms_cache = (None, '')
+
+
+def _now_hms():
+    """Return the current time as HH:MM:SS, formatting it at most once per second."""
+    global _hms_cache
+    second = int(time.time())
+    cached = _hms_cache
+    if cached[0] != second:
+        cached = (second, time.strftime('%H:%M:%S', time.localtime(second)))
+        _hms_cache = cached
+    return cached[1]
+
 CONFIG_MODULE_NAME = 'config'
 CONFIG_FILE_PATH = Path(__file__).resolve().parent / 'config.py'
 CONFIG_KEYS = [
@@ -80,37 +168,76 @@ CONFIG_KEYS = [
 ]
 
 
+# Config snapshots keyed on file modification times, so unchanged files skip
+# re-executing config.py and rebuilding the Pydantic Settings instance
+_config_module_cache = {'mtimes': None}
+_config_cache = {'mtimes': None, 'values': None}
+
+
+def _get_env_file_path():
+    """Return the .env file path (consistent with logic in config.py)."""
+    cwd_env = Path.cwd() / ".env"
+    return cwd_env if cwd_env.exists() else (Path(__file__).resolve().parent / ".env")
+
+
+def _get_mtime(path):
+    """Return the file's modification time in nanoseconds, or None if it does not exist."""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
 def _load_config_module():
     """Load or reload the config module to ensure latest values are available."""
-    importlib.invalidate_caches()
+    mtimes = (_get_mtime(CONFIG_FILE_PATH), _get_mtime(_get_env_file_path()))
+    # Fast path: a single sys.modules lookup while neither file has changed
     module = sys.modules.get(CONFIG_MODULE_NAME)
+    if module is not None and mtimes == _config_module_cache['mtimes']:
+        return module
     try:
         if module is None:
             module = importlib.import_module(CONFIG_MODULE_NAME)
         else:
+            # Only rescan the import finders when the module actually has to be reloaded
+            importlib.invalidate_caches()
             module = importlib.reload(module)
     except ModuleNotFoundError:
         return None
+    _config_module_cache['mtimes'] = mtimes
     return module
 
 
+def _collect_config_values(settings):
+    """Extract the frontend-exposed values from a Settings instance."""
+    values = {}
+    for key in CONFIG_KEYS:
+        # Read values from Pydantic Settings instance
+        value = getattr(settings, key, None)
+        # Convert to string for uniform handling on the frontend.
+        if value is None:
+            values[key] = ''
+        else:
+            values[key] = str(value)
+    return values
+
+
 def read_config_values():
     """Return the current configuration values that are exposed to the frontend."""
     try:
+        # Defaults live in config.py and overrides in .env, so a change to either invalidates the cache
+        mtimes = (_get_mtime(CONFIG_FILE_PATH), _get_mtime(_get_env_file_path()))
+        if _config_cache['values'] is not None and mtimes == _config_cache['mtimes']:
+            return dict(_config_cache['values'])
+
         # Reload configuration to get the latest Settings instance
-        from config import reload_settings, settings
-        reload_settings()
-
-        values = {}
-        for key in CONFIG_KEYS:
-            # Read values from Pydantic Settings instance
-            value = getattr(settings, key, None)
-            # Convert to string for uniform handling on the frontend.
-            if value is None:
-                values[key] = ''
-            else:
-                values[key] = str(value)
-        return values
+        from config import reload_settings
+        settings = reload_settings()
+
+        values = _collect_config_values(settings)
+        _config_cache['mtimes'] = mtimes
+        _config_cache['values'] = values
+        return dict(values)
     except Exception as exc:
         logger.exception(f"Failed to read configuration: {exc}")
         return {}
@@ -131,26 +258,27 @@ def _serialize_config_value(value):
 
 
 def write_config_values(updates):
-    """Persist configuration updates to .env file (Pydantic Settings source)."""
-    from pathlib import Path
+    """Persist configuration updates to .env file (Pydantic Settings source).
 
-    # Determine .env file path (consistent with logic in config.py)
-    project_root = Path(__file__).resolve().parent
-    cwd_env = Path.cwd() / ".env"
-    env_file_path = cwd_env if cwd_env.exists() else (project_root / ".env")
+    Returns True if the file content changed, False if the updates were a no-op.
+    """
+    env_file_path = _get_env_file_path()
 
     # Read existing .env file content
+    file_text = None
     env_lines = []
     env_key_indices = {}  # Record the index position of each key in the file
     if env_file_path.exists():
-        env_lines = env_file_path.read_text(encoding='utf-8').splitlines()
+        file_text = env_file_path.read_text(encoding='utf-8')
+        env_lines = file_text.splitlines()
         # Extract existing keys and their indices
         for i, line in enumerate(env_lines):
-            line_stripped = line.strip()
-            if line_stripped and not line_stripped.startswith('#'):
-                if '=' in line_stripped:
-                    key = line_stripped.split('=')[0].strip()
-                    env_key_indices[key] = i
+            stripped = line.strip()
+            if not stripped or stripped[0] == '#':
+                continue
+            key, sep, _ = stripped.partition('=')
+            if sep:
+                env_key_indices[key.rstrip()] = i
 
     # Update or add configuration items
     for key, raw_value in updates.items():
@@ -178,12 +306,27 @@ def write_config_values(updates):
             # Add new line to end of file
             env_lines.append(f'{key}={env_value}')
 
+    # Nothing changed: skip the write and the config reload
+    new_text = '\n'.join(env_lines) + '\n'
+    if new_text == file_text:
+        return False
+
     # Write to .env file
     env_file_path.parent.mkdir(parents=True, exist_ok=True)
-    env_file_path.write_text('\n'.join(env_lines) + '\n', encoding='utf-8')
+    env_file_path.write_text(new_text, encoding='utf-8')
+
+    # Coarse filesystem timestamps may not change within the same second, so drop the cache explicitly
+    _config_cache['values'] = None
+    _config_module_cache['mtimes'] = None
 
     # Reload configuration module (this will re-read .env file and create new Settings instance)
-    _load_config_module()
+    module = _load_config_module()
+    settings = getattr(module, 'settings', None)
+    if settings is not None:
+        # Seed the read cache from the Settings instance just built, so the follow-up read does not build another
+        _config_cache['mtimes'] = _config_module_cache['mtimes']
+        _config_cache['values'] = _collect_config_values(settings)
+    return True
 
 
 system_state_lock = threading.Lock()
@@ -191,6 +334,8 @@ system_state = {
     'started': False,
     'starting': False
 }
+# Applications currently being started through /api/start/<app_name> (protected by system_state_lock)
+app_starting = set()
 
 
 def _set_system_state(*, started=None, starting=None):
@@ -219,6 +364,23 @@ def _prepare_system_start():
         return True, None
 
 
+def _prepare_app_start(app_name):
+    """Mark a single application as starting unless it is already running or starting."""
+    with system_state_lock:
+        if app_name in app_starting:
+            return False, 'Application is starting'
+        if processes[app_name]['process'] is not None:
+            return False, 'Application already running'
+        app_starting.add(app_name)
+        return True, None
+
+
+def _finish_app_start(app_name):
+    """Clear the starting flag of a single application."""
+    with system_state_lock:
+        app_starting.discard(app_name)
+
+
 def initialize_system_components():
     """Start all dependent components (Streamlit sub-applications, ForumEngine, ReportEngine)."""
     logs = []
@@ -241,21 +403,17 @@ def initialize_system_components():
     processes['forum']['status'] = 'stopped'
 
     for app_name, script_path in STREAMLIT_SCRIPTS.items():
+        # start_streamlit_app checks that the script exists
         logs.append(f"Checking file: {script_path}")
-        if os.path.exists(script_path):
-            success, message = start_streamlit_app(app_name, script_path, processes[app_name]['port'])
-            logs.append(f"{app_name}: {message}")
-            if success:
-                startup_success, startup_message = wait_for_app_startup(app_name, 30)
-                logs.append(f"{app_name} startup check: {startup_message}")
-                if not startup_success:
-                    errors.append(f"{app_name} startup failed: {startup_message}")
-            else:
-                errors.append(f"{app_name} startup failed: {message}")
+        success, message = start_streamlit_app(app_name, script_path, processes[app_name]['port'])
+        logs.append(f"{app_name}: {message}")
+        if success:
+            startup_success, startup_message = wait_for_app_startup(app_name, 30)
+            logs.append(f"{app_name} startup check: {startup_message}")
+            if not startup_success:
+                errors.append(f"{app_name} startup failed: {startup_message}")
         else:
-            msg = f"File does not exist: {script_path}"
-            logs.append(f"Error: {msg}")
-            errors.append(f"{app_name}: {msg}")
+            errors.append(f"{app_name} startup failed: {message}")
 
     forum_started = False
     try:
@@ -298,17 +456,10 @@ def init_forum_log():
     """Initialize forum.log file"""
     try:
         forum_log_file = LOG_DIR / "forum.log"
-        # If file doesn't exist create and write a start message, if it exists clear and write a start message
-        if not forum_log_file.exists():
-            with open(forum_log_file, 'w', encoding='utf-8') as f:
-                start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"=== ForumEngine System Initialization - {start_time} ===\n")
-            logger.info(f"ForumEngine: forum.log initialized")
-        else:
-            with open(forum_log_file, 'w', encoding='utf-8') as f:
-                start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"=== ForumEngine System Initialization - {start_time} ===\n")
-            logger.info(f"ForumEngine: forum.log initialized")
+        # Create or clear the file and write a start message
+        start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        forum_log_file.write_text(f"=== ForumEngine System Initialization - {start_time} ===\n", encoding='utf-8')
+        logger.info(f"ForumEngine: forum.log initialized")
     except Exception as e:
         logger.exception(f"ForumEngine: Failed to initialize forum.log: {e}")
 
@@ -319,7 +470,7 @@ init_forum_log()
 def start_forum_engine():
     """Start ForumEngine forum"""
     try:
-        from ForumEngine.monitor import start_forum_monitoring
+        start_forum_monitoring, _ = _forum_monitor_functions()
         logger.info("ForumEngine: Starting forum...")
         success = start_forum_monitoring()
         if not success:
@@ -331,30 +482,31 @@ def start_forum_engine():
 def stop_forum_engine():
     """Stop ForumEngine forum"""
     try:
-        from ForumEngine.monitor import stop_forum_monitoring
+        _, stop_forum_monitoring = _forum_monitor_functions()
         logger.info("ForumEngine: Stopping forum...")
         stop_forum_monitoring()
         logger.info("ForumEngine: Forum stopped")
     except Exception as e:
         logger.exception(f"ForumEngine: Failed to stop forum: {e}")
 
+# Match format: [time] [source] content
+FORUM_LOG_LINE_PATTERN = re.compile(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[([A-Z]+)\]\s*(.*)')
+FORUM_AGENT_SOURCES = frozenset({'QUERY', 'INSIGHT', 'MEDIA'})
+
+
 def parse_forum_log_line(line):
     """Parse forum.log line content and extract conversation information"""
-    import re
+    # Cheap prefix check before running the regex on lines that cannot match
+    if not line.startswith('['):
+        return None
 
-    # Match format: [time] [source] content
-    pattern = r'\[(\d{2}:\d{2}:\d{2})\]\s*\[([A-Z]+)\]\s*(.*)'
-    match = re.match(pattern, line)
+    match = FORUM_LOG_LINE_PATTERN.match(line)
 
     if match:
         timestamp, source, content = match.groups()
 
-        # Filter out system messages and empty content
-        if source == 'SYSTEM' or not content.strip():
-            return None
-
-        # Only process messages from three Engines
-        if source not in ['QUERY', 'INSIGHT', 'MEDIA']:
+        # Only process messages from three Engines (this also filters out SYSTEM messages)
+        if source not in FORUM_AGENT_SOURCES or not content.strip():
             return None
 
         # Determine message type and sender based on source
@@ -371,72 +523,113 @@ def parse_forum_log_line(line):
 
     return None
 
+# Re-check interval when OS file-change notifications are (or are not) available
+FORUM_LOG_POLL_INTERVAL = 1
+FORUM_LOG_FALLBACK_POLL_INTERVAL = 30
+
+
+def _start_forum_log_watcher(forum_log_file, changed_event):
+    """Watch forum.log via OS notifications (inotify/ReadDirectoryChangesW); return None if watchdog is unavailable."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        logger.info("watchdog not installed, forum.log will be polled every second")
+        return None
+
+    class ForumLogHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if Path(event.src_path).name == forum_log_file.name:
+                changed_event.set()
+
+    # Watch the directory so the file being recreated is also noticed
+    observer = Observer()
+    observer.schedule(ForumLogHandler(), str(forum_log_file.parent), recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+# Number of recent forum.log line hashes kept for deduplication
+FORUM_LOG_DEDUP_SIZE = 1000
+
+
+def _forum_line_digest(line):
+    """Return a fixed-size 8-byte BLAKE2b digest of a stripped forum.log line."""
+    return hashlib.blake2b(line.encode('utf-8', 'replace'), digest_size=8).digest()
+
+
+def _remember_forum_line(processed_lines, line_hash):
+    """Record a new processed line hash, evicting the oldest one once the bounded history is full."""
+    # Callers skip hashes already present, so insertion order is already oldest-first
+    processed_lines[line_hash] = None
+    if len(processed_lines) > FORUM_LOG_DEDUP_SIZE:
+        processed_lines.popitem(last=False)
+
 # Forum log listener
 def monitor_forum_log():
     """Listen for forum.log file changes and push to frontend"""
-    import time
-    from pathlib import Path
-
     forum_log_file = LOG_DIR / "forum.log"
     last_position = 0
-    processed_lines = set()  # Used to track processed lines to avoid duplicates
+    processed_lines = OrderedDict()  # Hashes of recently processed lines (oldest first) to avoid duplicates
+
+    forum_log_changed = threading.Event()
+    try:
+        watcher = _start_forum_log_watcher(forum_log_file, forum_log_changed)
+    except Exception as e:
+        logger.warning(f"Failed to watch forum.log, falling back to polling: {e}")
+        watcher = None
+    # Keep a slow poll even with notifications, they are unreliable on NFS/container filesystems
+    poll_interval = FORUM_LOG_FALLBACK_POLL_INTERVAL if watcher else FORUM_LOG_POLL_INTERVAL
 
-    # If file exists, get initial position
+    # If file exists, start tailing from its end; existing lines are served by /api/forum/log
     if forum_log_file.exists():
-        with open(forum_log_file, 'r', encoding='utf-8', errors='ignore') as f:
-            # Read all existing lines during initialization to avoid duplicate processing
-            existing_lines = f.readlines()
-            for line in existing_lines:
-                line_hash = hash(line.strip())
-                processed_lines.add(line_hash)
-            last_position = f.tell()
+        last_position = forum_log_file.stat().st_size
 
     while True:
         try:
             if forum_log_file.exists():
                 with open(forum_log_file, 'r', encoding='utf-8', errors='ignore') as f:
+                    # File was truncated/recreated: read it again from the start
+                    if f.seek(0, os.SEEK_END) < last_position:
+                        last_position = 0
                     f.seek(last_position)
                     new_lines = f.readlines()
 
                     if new_lines:
+                        forum_messages = []
                         for line in new_lines:
                             line = line.rstrip('\n\r')
                             if line.strip():
-                                line_hash = hash(line.strip())
+                                line_hash = _forum_line_digest(line.strip())
 
                                 # Avoid reprocessing the same line
                                 if line_hash in processed_lines:
                                     continue
 
-                                processed_lines.add(line_hash)
+                                _remember_forum_line(processed_lines, line_hash)
 
-                                # Parse log line and send forum message
+                                # Parse log line, forum messages are sent together after this read
                                 parsed_message = parse_forum_log_line(line)
                                 if parsed_message:
-                                    socketio.emit('forum_message', parsed_message)
+                                    forum_messages.append(parsed_message)
 
                                 # Only send console messages when displaying forum in console
-                                timestamp = datetime.now().strftime('%H:%M:%S')
+                                timestamp = _now_hms()
                                 formatted_line = f"[{timestamp}] {line}"
-                                socketio.emit('console_output', {
-                                    'app': 'forum',
-                                    'line': formatted_line
-                                })
+                                queue_console_output('forum', formatted_line)
 
-                        last_position = f.tell()
+                        # One frame for all messages appended since the last read
+                        if forum_messages:
+                            socketio.emit('forum_message_batch', {'messages': forum_messages})
 
-                        # Clean processed_lines set to avoid memory leak (keep hashes of last 1000 lines)
-                        if len(processed_lines) > 1000:
-                            processed_lines.clear()
+                        last_position = f.tell()
 
-            time.sleep(1)  # Check once per second
+            # Sleep until forum.log changes (or the poll interval elapses)
+            if forum_log_changed.wait(poll_interval):
+                forum_log_changed.clear()
         except Exception as e:
             logger.error(f"Forum log listening error: {e}")
-            time.sleep(5)
-
-# Start Forum log listening thread
-forum_monitor_thread = threading.Thread(target=monitor_forum_log, daemon=True)
-forum_monitor_thread.start()
+            socketio.sleep(5)
 
 # Global variable storing process information
 processes = {
@@ -452,6 +645,27 @@ STREAMLIT_SCRIPTS = {
     'query': 'SingleEngineApp/query_engine_streamlit_app.py'
 }
 
+# Fixed parts of the Streamlit command line: base args + script + port + options
+STREAMLIT_BASE_ARGS = (sys.executable, '-m', 'streamlit', 'run')
+STREAMLIT_OPTION_ARGS = (
+    '--server.headless', 'true',
+    '--browser.gatherUsageStats', 'false',
+    # '--logger.level', 'debug',  # Increase log verbosity
+    '--logger.level', 'info',
+    '--server.enableCORS', 'false'
+)
+
+# Environment variables to ensure UTF-8 encoding and reduce buffering in Streamlit processes
+STREAMLIT_ENV = {
+    **os.environ,
+    'PYTHONIOENCODING': 'utf-8',
+    'PYTHONUTF8': '1',
+    'LANG': 'en_US.UTF-8',
+    'LC_ALL': 'en_US.UTF-8',
+    'PYTHONUNBUFFERED': '1',  # Disable Python buffering
+    'STREAMLIT_BROWSER_GATHER_USAGE_STATS': 'false'
+}
+
 # Output queues
 output_queues = {
     'insight': Queue(),
@@ -459,17 +673,87 @@ output_queues = {
     'query': Queue(),
     'forum': Queue()
 }
+console_output_ready = threading.Event()
+
+# Window for coalescing bursty console output into a single Socket.IO frame
+CONSOLE_OUTPUT_FLUSH_INTERVAL = 0.05
+
+
+def queue_console_output(app_name, line):
+    """Buffer a console line; flush_console_output pushes buffered lines to the frontend in batches"""
+    output_queues[app_name].put(line)
+    console_output_ready.set()
+
+
+def flush_console_output():
+    """Emit buffered console lines as one console_output_batch frame per application"""
+    while True:
+        console_output_ready.wait()
+        # Let the rest of a burst (e.g. a traceback) accumulate before emitting
+        socketio.sleep(CONSOLE_OUTPUT_FLUSH_INTERVAL)
+        console_output_ready.clear()
+
+        for app_name, output_queue in output_queues.items():
+            lines = []
+            while True:
+                try:
+                    lines.append(output_queue.get_nowait())
+                except Empty:
+                    break
+            if lines:
+                socketio.emit('console_output_batch', {
+                    'app': app_name,
+                    'lines': lines
+                })
+
+        # Log files are written through buffered handles, flush them once per batch
+        flush_log_files()
+
+
+# Persistent buffered log file handles per application, guarded by _log_lock
+_log_handles = {}
+_log_lock = threading.Lock()
+
 
 def write_log_to_file(app_name, line):
     """Write log to file"""
     try:
-        log_file_path = LOG_DIR / f"{app_name}.log"
-        with open(log_file_path, 'a', encoding='utf-8') as f:
+        with _log_lock:
+            f = _log_handles.get(app_name)
+            if f is None or f.closed:
+                log_file_path = LOG_DIR / f"{app_name}.log"
+                f = open(log_file_path, 'a', encoding='utf-8', buffering=8192)
+                _log_handles[app_name] = f
             f.write(line + '\n')
-            f.flush()
     except Exception as e:
         logger.error(f"Error writing log for {app_name}: {e}")
 
+def flush_log_files(app_name=None):
+    """Flush buffered log writes for one application (or all of them)"""
+    with _log_lock:
+        handles = [_log_handles.get(app_name)] if app_name else list(_log_handles.values())
+        for f in handles:
+            if f is not None and not f.closed:
+                f.flush()
+
+def close_log_file(app_name):
+    """Close an application's log file handle (e.g. before the file is removed)"""
+    with _log_lock:
+        f = _log_handles.pop(app_name, None)
+        if f is not None:
+            f.close()
+
+def close_log_files():
+    """Close all log file handles"""
+    for app_name in list(_log_handles):
+        close_log_file(app_name)
+
+atexit.register(close_log_files)
+
+# Start console output flushing and Forum log listening tasks once the log file helpers they call exist
+socketio.start_background_task(flush_console_output)
+forum_monitor_thread = socketio.start_background_task(monitor_forum_log)
+
 def read_log_from_file(app_name, tail_lines=None):
     """Read log from file"""
     try:
@@ -477,12 +761,14 @@ def read_log_from_file(app_name, tail_lines=None):
         if not log_file_path.exists():
             return []
 
+        flush_log_files(app_name)
+
+        if tail_lines:
+            return read_tail_lines(log_file_path, tail_lines)
+
         with open(log_file_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
             lines = [line.rstrip('\n\r') for line in lines if line.strip()]
-
-            if tail_lines:
-                return lines[-tail_lines:]
             return lines
     except Exception as e:
         logger.exception(f"Error reading log for {app_name}: {e}")
@@ -490,74 +776,25 @@ def read_log_from_file(app_name, tail_lines=None):
 
 def read_process_output(process, app_name):
     """Read process output and write to file"""
-    import select
-    import sys
+    try:
+        # readline blocks cooperatively under eventlet (or in its own thread under the threading
+        # backend) and returns b'' once the process has exited and its output is drained
+        for output in iter(process.stdout.readline, b''):
+            line = output.decode('utf-8', errors='replace').strip()
+            if line:
+                timestamp = _now_hms()
+                formatted_line = f"[{timestamp}] {line}"
 
-    while True:
-        try:
-            if process.poll() is not None:
-                # Process ended, read remaining output
-                remaining_output = process.stdout.read()
-                if remaining_output:
-                    lines = remaining_output.decode('utf-8', errors='replace').split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if line:
-                            timestamp = datetime.now().strftime('%H:%M:%S')
-                            formatted_line = f"[{timestamp}] {line}"
-                            write_log_to_file(app_name, formatted_line)
-                            socketio.emit('console_output', {
-                                'app': app_name,
-                                'line': formatted_line
-                            })
-                break
-
-            # Use non-blocking read
-            if sys.platform == 'win32':
-                # Use different method on Windows
-                output = process.stdout.readline()
-                if output:
-                    line = output.decode('utf-8', errors='replace').strip()
-                    if line:
-                        timestamp = datetime.now().strftime('%H:%M:%S')
-                        formatted_line = f"[{timestamp}] {line}"
-
-                        # Write to log file
-                        write_log_to_file(app_name, formatted_line)
-
-                        # Send to frontend
-                        socketio.emit('console_output', {
-                            'app': app_name,
-                            'line': formatted_line
-                        })
-                else:
-                    # Brief sleep when there's no output
-                    time.sleep(0.1)
-            else:
-                # Use select on Unix systems
-                ready, _, _ = select.select([process.stdout], [], [], 0.1)
-                if ready:
-                    output = process.stdout.readline()
-                    if output:
-                        line = output.decode('utf-8', errors='replace').strip()
-                        if line:
-                            timestamp = datetime.now().strftime('%H:%M:%S')
-                            formatted_line = f"[{timestamp}] {line}"
-
-                            # Write to log file
-                            write_log_to_file(app_name, formatted_line)
-
-                            # Send to frontend
-                            socketio.emit('console_output', {
-                                'app': app_name,
-                                'line': formatted_line
-                            })
+                # Write to log file
+                write_log_to_file(app_name, formatted_line)
 
-        except Exception as e:
-            error_msg = f"Error reading output for {app_name}: {e}"
-            logger.exception(error_msg)
-            write_log_to_file(app_name, f"[{datetime.now().strftime('%H:%M:%S')}] {error_msg}")
-            break
+                # Send to frontend
+                queue_console_output(app_name, formatted_line)
+
+    except Exception as e:
+        error_msg = f"Error reading output for {app_name}: {e}"
+        logger.exception(error_msg)
+        write_log_to_file(app_name, f"[{_now_hms()}] {error_msg}")
 
 def start_streamlit_app(app_name, script_path, port):
     """Start Streamlit application"""
@@ -570,35 +807,16 @@ def start_streamlit_app(app_name, script_path, port):
             return False, f"File does not exist: {script_path}"
 
         # Clear previous log file
+        close_log_file(app_name)
         log_file_path = LOG_DIR / f"{app_name}.log"
         if log_file_path.exists():
             log_file_path.unlink()
 
         # Create startup log
-        start_msg = f"[{datetime.now().strftime('%H:%M:%S')}] Starting {app_name} application..."
+        start_msg = f"[{_now_hms()}] Starting {app_name} application..."
         write_log_to_file(app_name, start_msg)
 
-        cmd = [
-            sys.executable, '-m', 'streamlit', 'run',
-            script_path,
-            '--server.port', str(port),
-            '--server.headless', 'true',
-            '--browser.gatherUsageStats', 'false',
-            # '--logger.level', 'debug',  # Increase log verbosity
-            '--logger.level', 'info',
-            '--server.enableCORS', 'false'
-        ]
-
-        # Set environment variables to ensure UTF-8 encoding and reduce buffering
-        env = os.environ.copy()
-        env.update({
-            'PYTHONIOENCODING': 'utf-8',
-            'PYTHONUTF8': '1',
-            'LANG': 'en_US.UTF-8',
-            'LC_ALL': 'en_US.UTF-8',
-            'PYTHONUNBUFFERED': '1',  # Disable Python buffering
-            'STREAMLIT_BROWSER_GATHER_USAGE_STATS': 'false'
-        })
+        cmd = [*STREAMLIT_BASE_ARGS, script_path, '--server.port', str(port), *STREAMLIT_OPTION_ARGS]
 
         # Use current working directory instead of script directory
         process = subprocess.Popen(
@@ -608,7 +826,7 @@ def start_streamlit_app(app_name, script_path, port):
             bufsize=0,  # No buffering
             universal_newlines=False,
             cwd=os.getcwd(),
-            env=env,
+            env=STREAMLIT_ENV,
             encoding=None,  # Let us handle encoding manually
             creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
         )
@@ -617,19 +835,14 @@ def start_streamlit_app(app_name, script_path, port):
         processes[app_name]['status'] = 'starting'
         processes[app_name]['output'] = []
 
-        # Start output reading thread
-        output_thread = threading.Thread(
-            target=read_process_output,
-            args=(process, app_name),
-            daemon=True
-        )
-        output_thread.start()
+        # Start output reading task
+        socketio.start_background_task(read_process_output, process, app_name)
 
         return True, f"{app_name} application starting..."
 
     except Exception as e:
         error_msg = f"Startup failed: {str(e)}"
-        write_log_to_file(app_name, f"[{datetime.now().strftime('%H:%M:%S')}] {error_msg}")
+        write_log_to_file(app_name, f"[{_now_hms()}] {error_msg}")
         return False, error_msg
 
 def stop_streamlit_app(app_name):
@@ -657,41 +870,92 @@ def stop_streamlit_app(app_name):
         return False, f"Stop failed: {str(e)}"
 
 HEALTHCHECK_PATH = "/_stcore/health"
-HEALTHCHECK_PROXIES = {'http': None, 'https': None}
+
+HEALTHCHECK_TIMEOUT = 2
+
+# Pooled session so health probes reuse keep-alive connections to the local Streamlit apps;
+# trust_env=False bypasses any proxy configured in the environment
+_healthcheck_session = requests.Session()
+_healthcheck_session.trust_env = False
+atexit.register(_healthcheck_session.close)
+
+# Shared across calls so status checks do not pay for spawning workers each time
+_healthcheck_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='healthcheck')
+atexit.register(_healthcheck_pool.shutdown, wait=False)
 
 
 def _build_healthcheck_url(port):
     return f"http://127.0.0.1:{port}{HEALTHCHECK_PATH}"
 
 
+def _probe_app_health(port):
+    """Return True if the Streamlit health endpoint on the given port answers 200."""
+    response = _healthcheck_session.get(_build_healthcheck_url(port), timeout=HEALTHCHECK_TIMEOUT)
+    return response.status_code == 200
+
+
+# How long a status check stays fresh for callers that can tolerate slightly stale status
+STATUS_CACHE_TTL = 1.0
+
+# Freshness window for socket status requests, collapses polls from many connected clients
+STATUS_REQUEST_MAX_AGE = 0.5
+
+_status_cache = {'checked_at': None}
+_status_lock = threading.Lock()
+
+
 def check_app_status():
     """Check application status"""
+    # Probe all running apps concurrently so one slow app does not add its timeout to the others
+    futures = {}
     for app_name, info in processes.items():
         if info['process'] is not None:
             if info['process'].poll() is None:
                 # Process still running, check if port is accessible
-                try:
-                    response = requests.get(
-                        _build_healthcheck_url(info['port']),
-                        timeout=2,
-                        proxies=HEALTHCHECK_PROXIES
-                    )
-                    if response.status_code == 200:
-                        info['status'] = 'running'
-                    else:
-                        info['status'] = 'starting'
-                except Exception as exc:
-                    logger.warning(f"{app_name} health check failed: {exc}")
-                    info['status'] = 'starting'
+                futures[app_name] = _healthcheck_pool.submit(_probe_app_health, info['port'])
             else:
                 # Process has ended
                 info['process'] = None
                 info['status'] = 'stopped'
 
+    for app_name, future in futures.items():
+        info = processes[app_name]
+        try:
+            info['status'] = 'running' if future.result(timeout=HEALTHCHECK_TIMEOUT + 1) else 'starting'
+        except Exception as exc:
+            logger.warning(f"{app_name} health check failed: {exc}")
+            info['status'] = 'starting'
+
+    _status_cache['checked_at'] = time.monotonic()
+
+
+def _status_is_fresh(max_age):
+    checked_at = _status_cache['checked_at']
+    return checked_at is not None and time.monotonic() - checked_at < max_age
+
+
+def refresh_app_status(max_age=STATUS_CACHE_TTL):
+    """Run check_app_status only if the last check is older than max_age seconds.
+
+    Concurrent callers wait for a single in-flight check and reuse its result.
+    """
+    if _status_is_fresh(max_age):
+        return
+    with _status_lock:
+        # Another caller may have refreshed while we waited for the lock
+        if not _status_is_fresh(max_age):
+            check_app_status()
+
+STARTUP_PROBE_INITIAL_DELAY = 0.05
+STARTUP_PROBE_BACKOFF = 1.6
+STARTUP_PROBE_MAX_DELAY = 1.0
+
+
 def wait_for_app_startup(app_name, max_wait_time=90):
     """Wait for application startup to complete"""
-    import time
     start_time = time.time()
+    # Probe quickly at first so fast-booting apps are detected immediately, backing off to 1 second
+    delay = STARTUP_PROBE_INITIAL_DELAY
     while time.time() - start_time < max_wait_time:
         info = processes[app_name]
         if info['process'] is None:
@@ -701,18 +965,15 @@ def wait_for_app_startup(app_name, max_wait_time=90):
             return False, "Process startup failed"
 
         try:
-            response = requests.get(
-                _build_healthcheck_url(info['port']),
-                timeout=2,
-                proxies=HEALTHCHECK_PROXIES
-            )
+            response = _healthcheck_session.get(_build_healthcheck_url(info['port']), timeout=HEALTHCHECK_TIMEOUT)
             if response.status_code == 200:
                 info['status'] = 'running'
                 return True, "Startup successful"
         except Exception as exc:
             logger.warning(f"{app_name} health check failed: {exc}")
 
-        time.sleep(1)
+        time.sleep(delay)
+        delay = min(delay * STARTUP_PROBE_BACKOFF, STARTUP_PROBE_MAX_DELAY)
 
     return False, "Startup timeout"
 
@@ -739,7 +1000,8 @@ def index():
 @app.route('/api/status')
 def get_status():
     """Get status of all applications"""
-    check_app_status()
+    # Shares the broadcaster's recent check instead of probing every app on each poll
+    refresh_app_status()
     return jsonify({
         app_name: {
             'status': info['status'],
@@ -768,17 +1030,25 @@ def start_app(app_name):
     if not script_path:
         return jsonify({'success': False, 'message': 'This application does not support start operation'})
 
-    success, message = start_streamlit_app(
-        app_name,
-        script_path,
-        processes[app_name]['port']
-    )
+    # Collapse concurrent start requests for the same application into one subprocess
+    can_start, message = _prepare_app_start(app_name)
+    if not can_start:
+        return jsonify({'success': False, 'message': message})
 
-    if success:
-        # Wait for application startup
-        startup_success, startup_message = wait_for_app_startup(app_name, 15)
-        if not startup_success:
-            message += f" but startup check failed: {startup_message}"
+    try:
+        success, message = start_streamlit_app(
+            app_name,
+            script_path,
+            processes[app_name]['port']
+        )
+
+        if success:
+            # Wait for application startup
+            startup_success, startup_message = wait_for_app_startup(app_name, 15)
+            if not startup_success:
+                message += f" but startup check failed: {startup_message}"
+    finally:
+        _finish_app_start(app_name)
 
     return jsonify({'success': success, 'message': message})
 
@@ -833,7 +1103,7 @@ def test_log(app_name):
         return jsonify({'success': False, 'message': 'Unknown application'})
 
     # Write test message
-    test_msg = f"[{datetime.now().strftime('%H:%M:%S')}] Test log message - {datetime.now()}"
+    test_msg = f"[{_now_hms()}] Test log message - {datetime.now()}"
     write_log_to_file(app_name, test_msg)
 
     # Send via Socket.IO
@@ -851,7 +1121,7 @@ def test_log(app_name):
 def start_forum_monitoring_api():
     """Manually start ForumEngine forum"""
     try:
-        from ForumEngine.monitor import start_forum_monitoring
+        start_forum_monitoring, _ = _forum_monitor_functions()
         success = start_forum_monitoring()
         if success:
             return jsonify({'success': True, 'message': 'ForumEngine forum started'})
@@ -864,17 +1134,42 @@ def start_forum_monitoring_api():
 def stop_forum_monitoring_api():
     """Manually stop ForumEngine forum"""
     try:
-        from ForumEngine.monitor import stop_forum_monitoring
+        _, stop_forum_monitoring = _forum_monitor_functions()
         stop_forum_monitoring()
         return jsonify({'success': True, 'message': 'ForumEngine forum stopped'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Failed to stop forum: {str(e)}'})
 
+# Read buffer for full forum.log scans
+FORUM_LOG_READ_BUFFER = 1 << 20
+
+def _stream_forum_log(forum_log_file):
+    """Yield parsed forum.log messages as NDJSON lines, followed by a summary line."""
+    total_lines = 0
+    try:
+        if forum_log_file.exists():
+            with open(forum_log_file, 'r', encoding='utf-8', errors='ignore', buffering=FORUM_LOG_READ_BUFFER) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    total_lines += 1
+                    parsed_message = parse_forum_log_line(line.rstrip('\n\r'))
+                    if parsed_message:
+                        yield app.json.dumps(parsed_message) + '\n'
+        summary = {'success': True, 'total_lines': total_lines}
+    except Exception as e:
+        summary = {'success': False, 'message': f'Failed to read forum.log: {str(e)}'}
+    yield app.json.dumps(summary) + '\n'
+
 @app.route('/api/forum/log')
 def get_forum_log():
     """Get ForumEngine's forum.log content"""
+    forum_log_file = LOG_DIR / "forum.log"
+    # ?stream=1 streams parsed messages as NDJSON instead of building one JSON document
+    if request.args.get('stream') == '1':
+        return Response(stream_with_context(_stream_forum_log(forum_log_file)), mimetype='application/x-ndjson')
+
     try:
-        forum_log_file = LOG_DIR / "forum.log"
         if not forum_log_file.exists():
             return jsonify({
                 'success': True,
@@ -883,16 +1178,18 @@ def get_forum_log():
                 'total_lines': 0
             })
 
-        with open(forum_log_file, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-            lines = [line.rstrip('\n\r') for line in lines if line.strip()]
-
-        # Parse each log line and extract conversation information
+        # Stream the file once, collecting non-empty lines and parsing conversation information inline
+        lines = []
         parsed_messages = []
-        for line in lines:
-            parsed_message = parse_forum_log_line(line)
-            if parsed_message:
-                parsed_messages.append(parsed_message)
+        with open(forum_log_file, 'r', encoding='utf-8', errors='ignore', buffering=FORUM_LOG_READ_BUFFER) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line = line.rstrip('\n\r')
+                lines.append(line)
+                parsed_message = parse_forum_log_line(line)
+                if parsed_message:
+                    parsed_messages.append(parsed_message)
 
         return jsonify({
             'success': True,
@@ -903,9 +1200,48 @@ def get_forum_log():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Failed to read forum.log: {str(e)}'})
 
+SEARCH_API_PORTS = {'insight': 8601, 'media': 8602, 'query': 8603}
+
+SEARCH_TIMEOUT = 10
+
+SEARCH_MAX_BODY_SIZE = 1024 * 1024
+
+# Keep-alive session and worker pool for fanning search requests out to the engine APIs in parallel
+_search_session = requests.Session()
+_search_session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+atexit.register(_search_session.close)
+
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='search')
+atexit.register(_search_pool.shutdown, wait=False)
+
+
+def _post_search(api_port, query):
+    """Send a search request to one engine API and return its JSON result."""
+    response = _search_session.post(
+        f"http://localhost:{api_port}/api/search",
+        json={'query': query},
+        timeout=SEARCH_TIMEOUT
+    )
+    if response.status_code == 200:
+        return response.json()
+    return {'success': False, 'message': 'API call failed'}
+
+
 @app.route('/api/search', methods=['POST'])
 def search():
     """Unified search interface"""
+    # Reject oversized bodies before they are read or parsed
+    if request.content_length is not None and request.content_length > SEARCH_MAX_BODY_SIZE:
+        return jsonify({'success': False, 'message': 'Search request too large'}), 413
+
+    # Check which applications are running first, so requests made before startup skip JSON decoding
+    # (a check from the last second is reused under bursty search load)
+    refresh_app_status()
+    running_apps = [name for name, info in processes.items() if info['status'] == 'running']
+
+    if not running_apps:
+        return jsonify({'success': False, 'message': 'No running applications'})
+
     data = request.get_json()
     query = data.get('query', '').strip()
 
@@ -915,30 +1251,19 @@ def search():
     # ForumEngine forum is already running in the background and will automatically detect search activity
     # logger.info("ForumEngine: Search request received, forum will automatically detect log changes")
 
-    # Check which applications are running
-    check_app_status()
-    running_apps = [name for name, info in processes.items() if info['status'] == 'running']
-
-    if not running_apps:
-        return jsonify({'success': False, 'message': 'No running applications'})
-
-    # Send search requests to running applications
+    # Send search requests to running applications concurrently, so latency is the slowest app rather than the sum
     results = {}
-    api_ports = {'insight': 8601, 'media': 8602, 'query': 8603}
-
+    futures = {}
     for app_name in running_apps:
         try:
-            api_port = api_ports[app_name]
             # Call Streamlit application's API endpoint
-            response = requests.post(
-                f"http://localhost:{api_port}/api/search",
-                json={'query': query},
-                timeout=10
-            )
-            if response.status_code == 200:
-                results[app_name] = response.json()
-            else:
-                results[app_name] = {'success': False, 'message': 'API call failed'}
+            futures[app_name] = _search_pool.submit(_post_search, SEARCH_API_PORTS[app_name], query)
+        except Exception as e:
+            results[app_name] = {'success': False, 'message': str(e)}
+
+    for app_name, future in futures.items():
+        try:
+            results[app_name] = future.result()
         except Exception as e:
             results[app_name] = {'success': False, 'message': str(e)}
 
@@ -1025,22 +1350,71 @@ def start_system():
     finally:
         _set_system_state(starting=False)
 
+# Interval of the server-side status check whose changes are pushed to all clients
+STATUS_BROADCAST_INTERVAL = 1.0
+
+# 'clients' counts connected Socket.IO clients; with none connected the broadcaster skips its checks
+_status_broadcaster = {'started': False, 'clients': 0}
+_status_broadcaster_lock = threading.Lock()
+
+
+def _status_snapshot():
+    """Return the status payload sent with 'status_update'."""
+    return {
+        app_name: {
+            'status': info['status'],
+            'port': info['port']
+        }
+        for app_name, info in processes.items()
+    }
+
+
+def broadcast_app_status():
+    """Check application status once for all clients and broadcast it whenever it changes."""
+    last_snapshot = None
+    while True:
+        socketio.sleep(STATUS_BROADCAST_INTERVAL)
+        if not _status_broadcaster['clients']:
+            # Nobody to notify: skip the health probes, and push the full status once a client is back
+            last_snapshot = None
+            continue
+        try:
+            refresh_app_status(STATUS_BROADCAST_INTERVAL)
+            snapshot = _status_snapshot()
+            if snapshot != last_snapshot:
+                socketio.emit('status_update', snapshot)
+                last_snapshot = snapshot
+        except Exception as e:
+            logger.error(f"Status broadcast error: {e}")
+
+
+def _ensure_status_broadcaster():
+    """Count a connected client and start the status broadcaster on the first connection."""
+    with _status_broadcaster_lock:
+        _status_broadcaster['clients'] += 1
+        if _status_broadcaster['started']:
+            return
+        _status_broadcaster['started'] = True
+    socketio.start_background_task(broadcast_app_status)
+
 @socketio.on('connect')
 def handle_connect():
     """Client connected"""
+    _ensure_status_broadcaster()
     emit('status', 'Connected to Flask server')
 
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    """Client disconnected"""
+    with _status_broadcaster_lock:
+        _status_broadcaster['clients'] = max(0, _status_broadcaster['clients'] - 1)
+
 @socketio.on('request_status')
 def handle_status_request():
     """Request status update"""
-    check_app_status()
-    emit('status_update', {
-        app_name: {
-            'status': info['status'],
-            'port': info['port']
-        }
-        for app_name, info in processes.items()
-    })
+    # Normally answered from the snapshot the broadcaster keeps fresh
+    refresh_app_status(STATUS_REQUEST_MAX_AGE)
+    emit('status_update', _status_snapshot())
 
 if __name__ == '__main__':
     # Read HOST and PORT from configuration file
@@ -1050,6 +1424,13 @@ if __name__ == '__main__':
 
     logger.info("Waiting for configuration confirmation, system will start components after frontend instruction...")
     logger.info(f"Flask server started, access URL: http://{HOST}:{PORT}")
+    if SOCKETIO_ASYNC_MODE == 'eventlet':
+        # socketio.run serves through eventlet.wsgi (one greenlet per connection); for a process manager use
+        # `gunicorn -k eventlet -w 1 app:app` instead (a single worker, Socket.IO state is per process)
+        logger.info("Socket.IO server: eventlet")
+    else:
+        logger.warning("eventlet not available, Socket.IO is served by the threaded Werkzeug server "
+                       "which supports far fewer concurrent connections")
 
     try:
         socketio.run(app, host=HOST, port=PORT, debug=False)
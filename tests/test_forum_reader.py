@@ -0,0 +1,219 @@
+"""
+测试utils/forum_reader.py中的倒序读取与HOST发言查找
+
+覆盖块边界、缺少末尾换行、空文件、CRLF换行以及跨块的多字节UTF-8字符
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.forum_reader import (
+    HOST_LINE_RE,
+    _iter_lines_reversed,
+    _match_host_line,
+    _find_latest_host_line,
+    read_tail_lines,
+    get_latest_host_speech,
+    get_recent_agent_speeches,
+)
+
+# 覆盖单字节、跨多字节字符以及大于文件本身的块大小
+CHUNK_SIZES = [1, 2, 3, 5, 64 * 1024]
+
+
+def write_log(tmp_path, data: bytes) -> Path:
+    """写入forum.log并返回路径"""
+    path = tmp_path / "forum.log"
+    path.write_bytes(data)
+    return path
+
+
+class TestIterLinesReversed:
+    """测试_iter_lines_reversed的倒序逐行读取"""
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_lines_straddling_chunk_boundary(self, tmp_path, chunk_size):
+        """行跨越块边界时应完整拼接"""
+        path = write_log(tmp_path, b"first line\nsecond line\nthird\n")
+        assert list(_iter_lines_reversed(path, chunk_size)) == ["third", "second line", "first line"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_missing_trailing_newline(self, tmp_path, chunk_size):
+        """没有末尾换行时最后一行同样产出"""
+        path = write_log(tmp_path, b"a\nb\nlast")
+        assert list(_iter_lines_reversed(path, chunk_size)) == ["last", "b", "a"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_empty_file(self, tmp_path, chunk_size):
+        """空文件不产出任何行"""
+        path = write_log(tmp_path, b"")
+        assert list(_iter_lines_reversed(path, chunk_size)) == []
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_blank_lines_preserved(self, tmp_path, chunk_size):
+        """中间的空行保留，只有文件末尾的换行不产生空行"""
+        path = write_log(tmp_path, b"\na\n\nb\n")
+        assert list(_iter_lines_reversed(path, chunk_size)) == ["b", "", "a", ""]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_crlf_line_endings(self, tmp_path, chunk_size):
+        """CRLF换行的\\r应被去掉，包括\\r和\\n分在两个块中的情况"""
+        path = write_log(tmp_path, b"one\r\ntwo\r\n\r\nthree\r\n")
+        assert list(_iter_lines_reversed(path, chunk_size)) == ["three", "", "two", "one"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_multibyte_utf8_split_across_chunks(self, tmp_path, chunk_size):
+        """多字节UTF-8字符被块边界切开时不应丢失或出现乱码"""
+        lines = ["[12:00:00] [HOST] 主持人总结😀", "[12:00:01] [QUERY] 查询结果：中文内容"]
+        path = write_log(tmp_path, ("\n".join(lines) + "\n").encode("utf-8"))
+        assert list(_iter_lines_reversed(path, chunk_size)) == lines[::-1]
+
+    def test_long_line_spanning_many_chunks(self, tmp_path):
+        """跨越大量块的长行应完整产出"""
+        long_line = "长" * 5000
+        path = write_log(tmp_path, f"head\n{long_line}\ntail".encode("utf-8"))
+        assert list(_iter_lines_reversed(path, 7)) == ["tail", long_line, "head"]
+
+
+class TestReadTailLines:
+    """测试read_tail_lines（app.py读取各应用日志尾部时使用）"""
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_last_lines_across_chunks(self, tmp_path, chunk_size):
+        """返回最后count个非空行，按文件顺序排列，跳过空行"""
+        path = write_log(tmp_path, b"l1\nl2\n\nl3\n   \nl4\n")
+        assert read_tail_lines(path, 3, chunk_size) == ["l2", "l3", "l4"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_missing_trailing_newline(self, tmp_path, chunk_size):
+        """没有末尾换行时最后一行同样返回"""
+        path = write_log(tmp_path, b"l1\nl2\nl3")
+        assert read_tail_lines(path, 2, chunk_size) == ["l2", "l3"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_empty_file(self, tmp_path, chunk_size):
+        """空文件返回空列表"""
+        path = write_log(tmp_path, b"")
+        assert read_tail_lines(path, 5, chunk_size) == []
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_crlf_line_endings(self, tmp_path, chunk_size):
+        """CRLF换行时不保留\\r，只含\\r\\n的空行被跳过"""
+        path = write_log(tmp_path, b"l1\r\nl2\r\n\r\nl3\r\n")
+        assert read_tail_lines(path, 2, chunk_size) == ["l2", "l3"]
+
+    @pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+    def test_multibyte_utf8_split_across_chunks(self, tmp_path, chunk_size):
+        """多字节UTF-8字符被块边界切开时完整还原"""
+        path = write_log(tmp_path, "启动应用\n正在搜索：舆情🔥\n完成\n".encode("utf-8"))
+        assert read_tail_lines(path, 2, chunk_size) == ["正在搜索：舆情🔥", "完成"]
+
+    def test_count_larger_than_file(self, tmp_path):
+        """请求的行数多于文件行数时返回全部非空行"""
+        path = write_log(tmp_path, b"a\n\nb\n")
+        assert read_tail_lines(path, 10) == ["a", "b"]
+
+    def test_non_positive_count(self, tmp_path):
+        """count不大于0时返回空列表"""
+        path = write_log(tmp_path, b"a\nb\n")
+        assert read_tail_lines(path, 0) == []
+
+
+class TestMatchHostLine:
+    """测试_match_host_line的快速路径与正则结果一致"""
+
+    @pytest.mark.parametrize("line, expected", [
+        ("[12:00:00] [HOST] 总结", ("12:00:00", "总结")),
+        ("[12:00:00]  [HOST]  总结", ("12:00:00", "总结")),
+        ("[ab:cd:ef] [HOST] hi", None),
+        ("[1a:00:00] [HOST] hi", None),
+        ("[12:00:00]x[HOST] hi", None),
+        ("[12:00:00] [QUERY] [HOST] hi", None),
+    ])
+    def test_matches_regex(self, line, expected):
+        """快速路径只接受正则同样接受的行"""
+        match = _match_host_line(line)
+        regex_match = HOST_LINE_RE.match(line)
+        assert (match is None) == (regex_match is None)
+        if match is not None:
+            match = (match[0], match[1].strip())
+        assert match == expected
+
+
+class TestFindLatestHostLine:
+    """测试_find_latest_host_line的mmap反向查找"""
+
+    def test_returns_last_host_line(self, tmp_path):
+        """返回最后一条HOST发言"""
+        path = write_log(tmp_path, (
+            "[10:00:00] [HOST] 第一次总结\n"
+            "[10:00:05] [QUERY] 查询\n"
+            "[10:00:10] [HOST] 第二次总结\n"
+            "[10:00:15] [MEDIA] 媒体\n"
+        ).encode("utf-8"))
+        assert _find_latest_host_line(path) == ("10:00:10", "第二次总结")
+
+    def test_missing_trailing_newline(self, tmp_path):
+        """HOST发言是没有末尾换行的最后一行"""
+        path = write_log(tmp_path, "[10:00:00] [QUERY] 查询\n[10:00:10] [HOST] 最后".encode("utf-8"))
+        assert _find_latest_host_line(path) == ("10:00:10", "最后")
+
+    def test_empty_file(self, tmp_path):
+        """空文件返回None"""
+        path = write_log(tmp_path, b"")
+        assert _find_latest_host_line(path) is None
+
+    def test_no_host_line(self, tmp_path):
+        """没有HOST发言时返回None"""
+        path = write_log(tmp_path, b"[10:00:00] [QUERY] a\n[10:00:01] [MEDIA] b\n")
+        assert _find_latest_host_line(path) is None
+
+    def test_crlf_line_endings(self, tmp_path):
+        """CRLF换行时时间和内容仍能解析，内容中的\\r由调用方去除"""
+        path = write_log(tmp_path, "[10:00:10] [HOST] 总结\r\n[10:00:15] [QUERY] 查询\r\n".encode("utf-8"))
+        timestamp, content = _find_latest_host_line(path)
+        assert timestamp == "10:00:10"
+        assert content.strip() == "总结"
+
+    def test_host_marker_inside_other_line(self, tmp_path):
+        """其他行内容中出现的[HOST]不应被当作HOST发言"""
+        path = write_log(tmp_path, (
+            "[10:00:00] [HOST] 真正的总结\n"
+            "[10:00:05] [QUERY] 引用了 [HOST] 的观点\n"
+        ).encode("utf-8"))
+        assert _find_latest_host_line(path) == ("10:00:00", "真正的总结")
+
+
+class TestForumSpeeches:
+    """测试对外的发言读取函数"""
+
+    def test_latest_host_speech_unescapes_newlines(self, tmp_path):
+        """HOST发言中转义的换行应被还原，CRLF的\\r应被去除"""
+        write_log(tmp_path, "[10:00:10] [HOST] 第一段\\n第二段\r\n".encode("utf-8"))
+        assert get_latest_host_speech(str(tmp_path)) == "第一段\n第二段"
+
+    def test_latest_host_speech_missing_file(self, tmp_path):
+        """forum.log不存在时返回None"""
+        assert get_latest_host_speech(str(tmp_path)) is None
+
+    def test_recent_agent_speeches_in_order(self, tmp_path):
+        """返回最近的Agent发言，按时间顺序排列且不包括HOST"""
+        write_log(tmp_path, (
+            "[10:00:00] [QUERY] 一\r\n"
+            "[10:00:01] [HOST] 主持\r\n"
+            "[10:00:02] [MEDIA] 二\r\n"
+            "[10:00:03] [INSIGHT] 三"
+        ).encode("utf-8"))
+        speeches = get_recent_agent_speeches(str(tmp_path), limit=2)
+        assert [(s["agent"], s["content"]) for s in speeches] == [("MEDIA", "二"), ("INSIGHT", "三")]
+
+    def test_recent_agent_speeches_empty_file(self, tmp_path):
+        """空文件返回空列表"""
+        write_log(tmp_path, b"")
+        assert get_recent_agent_speeches(str(tmp_path), limit=5) == []
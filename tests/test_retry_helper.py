@@ -0,0 +1,599 @@
+"""
+测试utils/retry_helper.py中的重试逻辑
+
+覆盖熔断器状态转换、在途调用合并、退避抖动范围、总耗时上限、
+Retry-After解析与总耗时约束、异常类型去重以及非幂等调用的可重试异常
+"""
+
+import asyncio
+import random
+import sys
+import threading
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+import requests
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import retry_helper
+from utils.retry_helper import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryConfig,
+    RetryableError,
+    LLM_MUTATING_RETRY_CONFIG,
+    LLM_RETRY_CONFIG,
+    SEARCH_API_RETRY_CONFIG,
+    _collapse_exception_types,
+    _retry_after_seconds,
+    with_graceful_retry,
+    with_retry,
+)
+
+
+class FakeTime:
+    """替换retry_helper中的time模块：sleep只推进虚拟时钟并记录等待时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(retry_helper, "time", clock)
+    return clock
+
+
+def http_error(retry_after=None) -> requests.HTTPError:
+    """构造带Retry-After响应头的HTTPError"""
+    response = requests.Response()
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return requests.HTTPError(response=response)
+
+
+class TestCircuitBreaker:
+    """测试熔断器状态转换"""
+
+    def test_opens_at_threshold(self, fake_time):
+        """连续失败达到阈值后打开，冷却期内拒绝调用"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.acquire() == (False, False)
+
+    def test_success_resets_failure_count(self, fake_time):
+        """成功后重新累计连续失败次数"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_allows_single_probe(self, fake_time):
+        """冷却期结束后只放行一个试探调用"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        fake_time.now += 30
+        assert breaker.acquire() == (True, True)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.acquire() == (False, False)
+
+    def test_probe_success_closes(self, fake_time):
+        """试探调用成功后关闭熔断器"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        fake_time.now += 30
+        breaker.acquire()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.acquire() == (True, False)
+
+    def test_probe_failure_reopens(self, fake_time):
+        """试探调用失败后重新打开并重新计算冷却期"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        fake_time.now += 30
+        breaker.acquire()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.acquire() == (False, False)
+
+    def test_release_probe_without_outcome(self, fake_time):
+        """试探调用未记录结果就结束时，释放后可以放行新的试探调用"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        fake_time.now += 30
+        breaker.acquire()
+        breaker.release_probe()
+        assert breaker.acquire() == (True, True)
+
+    def test_cancelled_async_probe_releases_breaker(self):
+        """被wait_for取消的异步试探调用不应让熔断器一直拒绝调用"""
+        state = {"mode": "fail"}
+
+        @with_retry(RetryConfig(max_retries=0, circuit_failure_threshold=1, circuit_cooldown=0.05))
+        async def call():
+            if state["mode"] == "fail":
+                raise ConnectionError("down")
+            if state["mode"] == "hang":
+                await asyncio.sleep(10)
+            return "ok"
+
+        async def scenario():
+            with pytest.raises(ConnectionError):
+                await call()
+            with pytest.raises(CircuitOpenError):
+                await call()
+            await asyncio.sleep(0.06)
+            state["mode"] = "hang"
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(call(), 0.05)
+            state["mode"] = "ok"
+            return await call()
+
+        assert asyncio.run(scenario()) == "ok"
+
+    def test_interrupted_sync_probe_releases_breaker(self, fake_time):
+        """同步试探调用被BaseException中断时同样释放试探名额"""
+        state = {"mode": "fail"}
+
+        @with_retry(RetryConfig(max_retries=0, circuit_failure_threshold=1, circuit_cooldown=30))
+        def call():
+            if state["mode"] == "fail":
+                raise ConnectionError("down")
+            if state["mode"] == "interrupt":
+                raise KeyboardInterrupt
+            return "ok"
+
+        with pytest.raises(ConnectionError):
+            call()
+        fake_time.now += 30
+        state["mode"] = "interrupt"
+        with pytest.raises(KeyboardInterrupt):
+            call()
+        state["mode"] = "ok"
+        assert call() == "ok"
+
+    def test_failures_counted_per_exhausted_call(self, fake_time):
+        """一次调用用尽重试后才计一次失败，调用内部的重试不会触发熔断"""
+        attempts = []
+
+        @with_graceful_retry(RetryConfig(max_retries=5, circuit_failure_threshold=2), default_return="default")
+        def call():
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        assert call() == "default"
+        assert len(attempts) == 6
+        assert call() == "default"
+        assert len(attempts) == 12
+        # 连续两次调用失败后熔断，第三次调用不再请求上游
+        assert call() == "default"
+        assert len(attempts) == 12
+
+    def test_non_retryable_probe_does_not_close(self, fake_time):
+        """试探调用遇到不可重试的异常时不关闭熔断器，只释放试探名额"""
+        state = {"error": ConnectionError("down")}
+
+        @with_retry(RetryConfig(max_retries=0, circuit_failure_threshold=2, circuit_cooldown=30))
+        def call():
+            raise state["error"]
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                call()
+        fake_time.now += 30
+        state["error"] = KeyError("bad request")
+        with pytest.raises(KeyError):
+            call()
+        # 熔断器仍处于半开状态，下一次调用作为新的试探调用放行，一次失败就重新熔断
+        state["error"] = ConnectionError("down")
+        with pytest.raises(ConnectionError):
+            call()
+        with pytest.raises(CircuitOpenError):
+            call()
+
+    def test_non_retryable_error_keeps_failure_count(self, fake_time):
+        """不可重试的异常不清零连续失败的调用数"""
+        errors = [ConnectionError("down"), KeyError("bad request"), ConnectionError("down")]
+        attempts = []
+
+        @with_graceful_retry(RetryConfig(max_retries=0, circuit_failure_threshold=2), default_return="default")
+        def call():
+            attempts.append(1)
+            raise errors[len(attempts) - 1]
+
+        for _ in range(3):
+            assert call() == "default"
+        # 第二次可重试的失败后已熔断，不再执行被装饰的函数
+        assert call() == "default"
+        assert len(attempts) == 3
+
+    def test_builtin_configs_enable_breaker(self):
+        """LLM与搜索API的预定义配置启用熔断"""
+        for config in (LLM_RETRY_CONFIG, LLM_MUTATING_RETRY_CONFIG, SEARCH_API_RETRY_CONFIG):
+            assert config.circuit_failure_threshold == 5
+            assert config.circuit_cooldown == 30.0
+
+    def test_disabled_by_default(self, fake_time):
+        """默认配置不启用熔断"""
+        assert RetryConfig().circuit_failure_threshold is None
+        attempts = []
+
+        @with_graceful_retry(RetryConfig(max_retries=0), default_return=None)
+        def call():
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        for _ in range(10):
+            call()
+        assert len(attempts) == 10
+
+
+class TestCoalescing:
+    """测试相同参数在途调用的合并"""
+
+    def test_sync_calls_share_one_execution(self):
+        """并发的相同调用只执行一次并共享结果"""
+        calls = []
+        started = threading.Event()
+
+        @with_retry(RetryConfig(max_retries=0), coalesce=True)
+        def call(x):
+            calls.append(x)
+            started.set()
+            time.sleep(0.1)
+            return x * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(call(3))) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [6] * 5
+        assert calls == [3]
+
+    def test_sync_waiters_get_their_own_error(self):
+        """同步等待者各自抛出领头调用异常的副本，原异常保留在__cause__中"""
+        started = threading.Event()
+        release = threading.Event()
+
+        @with_retry(RetryConfig(max_retries=0), coalesce=True)
+        def call(x):
+            started.set()
+            release.wait()
+            raise KeyError(x)
+
+        errors = []
+
+        def run():
+            try:
+                call(1)
+            except KeyError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 3
+        assert len({id(error) for error in errors}) == 3
+        assert all(error.args == (1,) for error in errors)
+        leader_error = next(error for error in errors if error.__cause__ is None)
+        assert all(error.__cause__ is leader_error for error in errors if error is not leader_error)
+
+    def test_async_calls_share_result_and_error(self):
+        """异步的相同调用共享结果和异常"""
+        calls = []
+
+        @with_retry(RetryConfig(max_retries=0), coalesce=True)
+        async def call(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            if x < 0:
+                raise KeyError(x)
+            return x
+
+        async def scenario():
+            ok = await asyncio.gather(*[call(1) for _ in range(4)])
+            failed = await asyncio.gather(*[call(-1) for _ in range(3)], return_exceptions=True)
+            return ok, failed
+
+        ok, failed = asyncio.run(scenario())
+        assert ok == [1] * 4
+        assert all(isinstance(error, KeyError) for error in failed)
+        assert calls == [1, -1]
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """第一个调用方被取消时，其他等待者仍然拿到结果"""
+        calls = []
+
+        @with_retry(RetryConfig(max_retries=0), coalesce=True)
+        async def call(x):
+            calls.append(x)
+            await asyncio.sleep(0.1)
+            return x
+
+        async def scenario():
+            first = asyncio.create_task(call(1))
+            await asyncio.sleep(0.01)
+            followers = [asyncio.create_task(call(1)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            first.cancel()
+            results = await asyncio.gather(*followers)
+            return first.cancelled(), results
+
+        cancelled, results = asyncio.run(scenario())
+        assert cancelled
+        assert results == [1, 1]
+        assert calls == [1]
+
+    def test_all_callers_cancelled_starts_fresh(self):
+        """所有调用方都取消后共享调用被取消，之后的调用重新执行"""
+        calls = []
+
+        @with_retry(RetryConfig(max_retries=0), coalesce=True)
+        async def call(x):
+            calls.append(x)
+            await asyncio.sleep(0.1)
+            return x
+
+        async def scenario():
+            task = asyncio.create_task(call(2))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.sleep(0.01)
+            return await call(2)
+
+        assert asyncio.run(scenario()) == 2
+        assert calls == [2, 2]
+
+
+class TestJitter:
+    """测试退避抖动的取值范围"""
+
+    def test_full_jitter_bounds(self):
+        """full抖动在[delay * (1 - jitter_factor), delay]内"""
+        config = RetryConfig(max_retries=4, initial_delay=1.0, backoff_factor=2.0, jitter="full", jitter_factor=0.5)
+        rng = random.Random(0)
+        for _ in range(200):
+            for attempt, base in enumerate(config.delays):
+                assert base * 0.5 <= config.next_delay(attempt, 1.0, rng) <= base
+
+    def test_decorrelated_jitter_bounds(self):
+        """decorrelated抖动在[initial_delay, min(max_delay, 上次延迟 * 3)]内"""
+        config = RetryConfig(max_retries=6, initial_delay=2.0, max_delay=10.0, jitter="decorrelated")
+        rng = random.Random(0)
+        for _ in range(200):
+            prev = config.initial_delay
+            for attempt in range(config.max_retries):
+                delay = config.next_delay(attempt, prev, rng)
+                assert config.initial_delay <= delay <= min(config.max_delay, prev * 3)
+                prev = delay
+
+    def test_no_jitter_uses_capped_backoff(self):
+        """不加抖动时按指数退避并受max_delay限制"""
+        config = RetryConfig(max_retries=5, initial_delay=1.0, backoff_factor=3.0, max_delay=20.0, jitter="none")
+        assert [config.next_delay(i, 0, random.Random()) for i in range(5)] == [1.0, 3.0, 9.0, 20.0, 20.0]
+
+    def test_unknown_jitter_rejected(self):
+        """未知的抖动策略抛出ValueError"""
+        with pytest.raises(ValueError):
+            RetryConfig(jitter="random")
+
+
+class TestTotalTimeout:
+    """测试总耗时上限"""
+
+    def test_stops_before_exceeding_deadline(self, fake_time):
+        """下一次等待会超出总耗时上限时不再重试"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=10, initial_delay=1.0, backoff_factor=2.0, jitter="none", total_timeout=5.0))
+        def call():
+            attempts.append(fake_time.now)
+            raise ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            call()
+        # 等待1秒、2秒后共用3秒，再等4秒会超过5秒上限
+        assert fake_time.sleeps == [1.0, 2.0]
+        assert len(attempts) == 3
+
+    def test_async_stops_before_exceeding_deadline(self):
+        """异步重试循环使用相同的截止时间判断"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=10, initial_delay=0.01, backoff_factor=2.0, jitter="none", total_timeout=0.05))
+        async def call():
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(call())
+        # 等待0.01秒、0.02秒后再等0.04秒会超过0.05秒上限
+        assert len(attempts) == 3
+
+    def test_no_limit_by_default(self, fake_time):
+        """未设置total_timeout时按max_retries重试"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=4, initial_delay=100.0, jitter="none"))
+        def call():
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            call()
+        assert len(attempts) == 5
+
+
+class TestRetryAfter:
+    """测试Retry-After响应头的解析和使用"""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("5", 5.0),
+        ("0.5", 0.5),
+        ("0", 0.0),
+        ("-3", 0.0),
+        ("inf", 0.0),
+        ("nan", 0.0),
+        ("soon", 0.0),
+        ("", 0.0),
+    ])
+    def test_parse_seconds(self, value, expected):
+        """秒数形式，非法或非正数值视为没有提示"""
+        assert _retry_after_seconds(http_error(value)) == expected
+
+    def test_parse_http_date(self):
+        """HTTP日期形式转换为距现在的秒数"""
+        seconds = _retry_after_seconds(http_error(formatdate(time.time() + 30, usegmt=True)))
+        assert 25 <= seconds <= 30
+
+    def test_past_http_date(self):
+        """已经过去的HTTP日期视为不需要额外等待"""
+        assert _retry_after_seconds(http_error(formatdate(time.time() - 30, usegmt=True))) == 0.0
+
+    def test_errors_without_response(self):
+        """没有响应或响应头时返回0"""
+        assert _retry_after_seconds(ConnectionError()) == 0.0
+        assert _retry_after_seconds(http_error()) == 0.0
+
+    def test_hint_raises_backoff(self, fake_time):
+        """提示的等待时间长于退避时间时按提示等待"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=1, initial_delay=1.0, max_delay=60.0, jitter="none"))
+        def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise http_error("7")
+            return "ok"
+
+        assert call() == "ok"
+        assert fake_time.sleeps == [7.0]
+
+    def test_hint_above_max_delay_is_honoured(self, fake_time):
+        """提示的等待时间超过max_delay时仍按提示等待"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=1, initial_delay=1.0, max_delay=25.0, jitter="none"))
+        def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise http_error("3600")
+            return "ok"
+
+        assert call() == "ok"
+        assert fake_time.sleeps == [3600.0]
+
+    def test_hint_bounded_by_total_timeout(self, fake_time):
+        """提示的等待会超出总耗时上限时不再重试，优雅模式返回默认值"""
+        attempts = []
+
+        @with_graceful_retry(RetryConfig(max_retries=5, initial_delay=1.0, max_delay=25.0, total_timeout=120.0), default_return="default")
+        def call():
+            attempts.append(1)
+            raise http_error("3600")
+
+        assert call() == "default"
+        assert len(attempts) == 1
+        assert fake_time.sleeps == []
+
+
+class TestExceptionTypes:
+    """测试可重试异常类型"""
+
+    def test_collapse_removes_duplicates_and_subclasses(self):
+        """去掉重复类型和已被覆盖的子类，保持原有顺序"""
+        collapsed = _collapse_exception_types((
+            requests.exceptions.Timeout,
+            ConnectionError,
+            requests.exceptions.RequestException,
+            ConnectionRefusedError,
+            ConnectionError,
+            ValueError,
+        ))
+        assert collapsed == (ConnectionError, requests.exceptions.RequestException, ValueError)
+
+    def test_collapse_catch_all(self):
+        """包含Exception时只保留Exception"""
+        assert _collapse_exception_types((KeyError, Exception, OSError)) == (Exception,)
+
+    def test_explicit_exceptions_are_collapsed(self):
+        """显式传入的异常类型同样会去重"""
+        config = RetryConfig(retry_on_exceptions=[OSError, ConnectionError, OSError])
+        assert config.retry_on_exceptions == (OSError,)
+
+    def test_default_exceptions_skip_program_errors(self):
+        """默认只重试临时性故障，KeyError等程序错误不重试"""
+        retry_on = RetryConfig().retry_on_exceptions
+        assert issubclass(requests.exceptions.ReadTimeout, retry_on)
+        assert issubclass(RetryableError, retry_on)
+        assert not issubclass(KeyError, retry_on)
+
+
+class TestIdempotency:
+    """测试非幂等调用的可重试异常"""
+
+    def test_mutating_config_retries_only_unsent_requests(self):
+        """非幂等配置只重试请求未发出的连接失败"""
+        retry_on = LLM_MUTATING_RETRY_CONFIG.retry_on_exceptions
+        assert issubclass(requests.exceptions.ConnectionError, retry_on)
+        assert issubclass(requests.exceptions.ConnectTimeout, retry_on)
+        assert issubclass(ConnectionRefusedError, retry_on)
+        assert not issubclass(requests.exceptions.ReadTimeout, retry_on)
+        assert not issubclass(requests.exceptions.HTTPError, retry_on)
+        assert not issubclass(ConnectionResetError, retry_on)
+
+    @pytest.mark.parametrize("error, expected_attempts", [
+        (requests.exceptions.ConnectTimeout(), 3),
+        (requests.exceptions.ReadTimeout(), 1),
+        (requests.exceptions.HTTPError(), 1),
+    ])
+    def test_non_idempotent_call(self, fake_time, error, expected_attempts):
+        """读超时和HTTP错误响应时服务端可能已处理请求，不再重试"""
+        attempts = []
+
+        @with_retry(RetryConfig(max_retries=2, idempotent=False))
+        def call():
+            attempts.append(1)
+            raise error
+
+        with pytest.raises(type(error)):
+            call()
+        assert len(attempts) == expected_attempts
+
+    def test_explicit_exceptions_override_idempotent(self):
+        """显式指定retry_on_exceptions时以调用方的设置为准"""
+        config = RetryConfig(idempotent=False, retry_on_exceptions=(requests.exceptions.Timeout,))
+        assert config.retry_on_exceptions == (requests.exceptions.Timeout,)
+
+    def test_idempotency_key_is_unique(self):
+        """幂等键每次生成都不同"""
+        assert retry_helper.make_idempotency_key() != retry_helper.make_idempotency_key()
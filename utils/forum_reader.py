@@ -1,13 +1,150 @@
 """
 Forum日志读取工具
-用于读取forum.log中的最新HOST发言
+用于读取forum.log中的最新HOST发言，以及从日志文件尾部倒序读取
 """
 
+import os
 import re
+import mmap
+from collections import deque
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Tuple
 from loguru import logger
 
+# 倒序读取时每次读取的块大小
+TAIL_CHUNK_SIZE = 64 * 1024
+
+# 预编译的日志行格式: [时间] [HOST] 内容 / [时间] [AGENT_NAME] 内容
+HOST_LINE_RE = re.compile(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)')
+AGENT_LINE_RE = re.compile(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[(INSIGHT|MEDIA|QUERY)\]\s*(.+)')
+
+
+def _unescape_content(content: str) -> str:
+    """
+    还原ForumEngine写入时转义的换行符，并去除首尾空白
+    
+    strip()需要在还原之后执行，才能去掉被转义的首尾换行
+    """
+    return content.replace('\\n', '\n').strip()
+
+
+def _match_host_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    解析HOST发言行，返回(时间, 原始内容)，不匹配时返回None
+    
+    日志由ForumEngine以固定格式"[HH:MM:SS] [HOST] 内容"写入，
+    先用字符串比较走快速路径，格式不规整时再回退到正则
+    """
+    # 快速路径接受的行必须也能被正则匹配：时间各段用isdecimal()检查，与\d的匹配范围一致
+    if (line[:1] == '[' and line[3:4] == ':' and line[6:7] == ':' and line[9:11] == '] '
+            and line[1:3].isdecimal() and line[4:6].isdecimal() and line[7:9].isdecimal()
+            and line.startswith('[HOST] ', 11)):
+        content = line[18:]
+        if content.strip():
+            return line[1:9], content
+    match = HOST_LINE_RE.match(line)
+    return match.groups() if match else None
+
+
+def _find_latest_host_line(file_path: Path) -> Optional[Tuple[str, str]]:
+    """
+    用mmap从文件末尾反向查找最后一条HOST发言行，返回(时间, 原始内容)
+    
+    rfind在C层面扫描整个映射区域，只有包含"[HOST]"的候选行才会被解码并解析
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            while True:
+                index = mm.rfind(b'[HOST]', 0, end)
+                if index < 0:
+                    return None
+                # 确定候选行的边界
+                line_start = mm.rfind(b'\n', 0, index) + 1
+                line_end = mm.find(b'\n', index)
+                if line_end < 0:
+                    line_end = len(mm)
+                match = _match_host_line(mm[line_start:line_end].decode('utf-8', errors='ignore'))
+                if match:
+                    return match
+                # "[HOST]"出现在其他行的内容中，继续在该行之前查找
+                end = line_start
+
+
+def _decode_line(line: bytes) -> str:
+    """解码一行日志，去掉CRLF换行留下的\r"""
+    return line.rstrip(b'\r').decode('utf-8', errors='ignore')
+
+
+def _iter_lines_reversed(file_path: Path, chunk_size: int = TAIL_CHUNK_SIZE) -> Iterator[str]:
+    """
+    从文件末尾开始按块倒序读取，逐行产出（从最后一行到第一行）
+    
+    与str.splitlines()的结果顺序相反：文件末尾的换行不会产生空行，空文件不产出任何行
+    
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        倒序的行迭代器，只读取实际需要的尾部数据
+    """
+    with open(file_path, 'rb') as f:
+        position = f.seek(0, 2)
+        # 当前行已读到的各块（倒序存放），读到行首时一次拼接，跨多个块的长行也只拼接一次
+        pending = []
+        at_end = True
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size)
+            # 按b'\n'切分是安全的，UTF-8多字节字符中不会出现该字节
+            parts = chunk.split(b'\n')
+            if len(parts) == 1:
+                pending.append(chunk)
+                continue
+            pending.append(parts[-1])
+            line = b''.join(reversed(pending))
+            # 文件以换行结尾时，最后一个换行之后的空串不算一行
+            if line or not at_end:
+                yield _decode_line(line)
+            at_end = False
+            for part in reversed(parts[1:-1]):
+                yield _decode_line(part)
+            # 第一段可能是不完整的行，留到下一块拼接
+            pending = [parts[0]]
+        line = b''.join(reversed(pending))
+        if line or not at_end:
+            yield _decode_line(line)
+
+
+def read_tail_lines(file_path: Path, count: int, chunk_size: int = TAIL_CHUNK_SIZE) -> List[str]:
+    """
+    读取文件最后count个非空行，只读取实际需要的尾部数据
+    
+    Args:
+        file_path: 文件路径
+        count: 需要的行数
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        按文件顺序排列的非空行列表
+    """
+    lines = []
+    if count <= 0:
+        return lines
+    for line in _iter_lines_reversed(file_path, chunk_size):
+        if line.strip():
+            lines.append(line)
+            if len(lines) >= count:
+                break
+    lines.reverse()
+    return lines
+
+
 def get_latest_host_speech(log_dir: str = "logs") -> Optional[str]:
     """
     获取forum.log中最新的HOST发言
@@ -25,19 +162,13 @@ def get_latest_host_speech(log_dir: str = "logs") -> Optional[str]:
             logger.debug("forum.log文件不存在")
             return None
             
-        with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
         # 从后往前查找最新的HOST发言
         host_speech = None
-        for line in reversed(lines):
-            # 匹配格式: [时间] [HOST] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)', line)
-            if match:
-                _, content = match.groups()
-                # 处理转义的换行符，还原为实际换行
-                host_speech = content.replace('\\n', '\n').strip()
-                break
+        match = _find_latest_host_line(forum_log_path)
+        if match:
+            _, content = match
+            # 处理转义的换行符，还原为实际换行
+            host_speech = _unescape_content(content)
         
         if host_speech:
             logger.info(f"找到最新的HOST发言，长度: {len(host_speech)}字符")
@@ -51,12 +182,13 @@ def get_latest_host_speech(log_dir: str = "logs") -> Optional[str]:
         return None
 
 
-def get_all_host_speeches(log_dir: str = "logs") -> List[Dict[str, str]]:
+def get_all_host_speeches(log_dir: str = "logs", limit: Optional[int] = None) -> List[Dict[str, str]]:
     """
     获取forum.log中所有的HOST发言
     
     Args:
         log_dir: 日志目录路径
+        limit: 只保留最近的N条发言（可选），内存占用与N成正比而不是与文件大小成正比
         
     Returns:
         包含所有HOST发言的列表，每个元素是包含timestamp和content的字典
@@ -68,24 +200,23 @@ def get_all_host_speeches(log_dir: str = "logs") -> List[Dict[str, str]]:
             logger.debug("forum.log文件不存在")
             return []
             
+        # 指定limit时使用定长队列，较早的发言会被自动丢弃
+        host_speeches = deque(maxlen=limit) if limit is not None else []
         with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        host_speeches = []
-        for line in lines:
-            # 匹配格式: [时间] [HOST] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[HOST\]\s*(.+)', line)
-            if match:
-                timestamp, content = match.groups()
-                # 处理转义的换行符
-                content = content.replace('\\n', '\n').strip()
-                host_speeches.append({
-                    'timestamp': timestamp,
-                    'content': content
-                })
+            for line in f:
+                # 匹配格式: [时间] [HOST] 内容
+                match = _match_host_line(line)
+                if match:
+                    timestamp, content = match
+                    # 处理转义的换行符
+                    content = _unescape_content(content)
+                    host_speeches.append({
+                        'timestamp': timestamp,
+                        'content': content
+                    })
         
         logger.info(f"找到{len(host_speeches)}条HOST发言")
-        return host_speeches
+        return list(host_speeches)
         
     except Exception as e:
         logger.error(f"读取forum.log失败: {str(e)}")
@@ -103,23 +234,24 @@ def get_recent_agent_speeches(log_dir: str = "logs", limit: int = 5) -> List[Dic
     Returns:
         包含最近Agent发言的列表
     """
+    # 不需要任何发言时直接返回，不打开文件
+    if limit <= 0:
+        return []
+    
     try:
         forum_log_path = Path(log_dir) / "forum.log"
         
         if not forum_log_path.exists():
             return []
             
-        with open(forum_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
         agent_speeches = []
-        for line in reversed(lines):  # 从后往前读取
+        for line in _iter_lines_reversed(forum_log_path):  # 从后往前读取
             # 匹配格式: [时间] [AGENT_NAME] 内容
-            match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]\s*\[(INSIGHT|MEDIA|QUERY)\]\s*(.+)', line)
+            match = AGENT_LINE_RE.match(line)
             if match:
                 timestamp, agent, content = match.groups()
                 # 处理转义的换行符
-                content = content.replace('\\n', '\n').strip()
+                content = _unescape_content(content)
                 agent_speeches.append({
                     'timestamp': timestamp,
                     'agent': agent,
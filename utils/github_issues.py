@@ -12,6 +12,8 @@ from urllib.parse import quote
 # GitHub 仓库信息
 GITHUB_REPO = "666ghj/BettaFish"
 GITHUB_ISSUES_URL = f"https://github.com/{GITHUB_REPO}/issues/new"
+# 预填充标题的 URL 前缀
+_ISSUE_URL_TITLE_PREFIX = f"{GITHUB_ISSUES_URL}?title="
 
 
 def create_issue_url(title: str, body: str = "") -> str:
@@ -25,13 +27,9 @@ def create_issue_url(title: str, body: str = "") -> str:
     Returns:
         完整的 GitHub Issues URL
     """
-    encoded_title = quote(title)
-    encoded_body = quote(body) if body else ""
-    
-    if encoded_body:
-        return f"{GITHUB_ISSUES_URL}?title={encoded_title}&body={encoded_body}"
-    else:
-        return f"{GITHUB_ISSUES_URL}?title={encoded_title}"
+    if body:
+        return f"{_ISSUE_URL_TITLE_PREFIX}{quote(title)}&body={quote(body)}"
+    return f"{_ISSUE_URL_TITLE_PREFIX}{quote(title)}"
 
 
 def error_with_issue_link(
@@ -62,13 +60,10 @@ def error_with_issue_link(
     
     issue_url = create_issue_url(issue_title, issue_body)
     
-    # 使用 markdown 格式添加超链接
-    error_display = f"{error_message}\n\n[📝 提交错误报告]({issue_url})"
-    
+    # 使用 markdown 格式添加超链接，有错误详情时一并展示
     if error_details:
-        error_display = f"{error_message}\n\n```\n{error_details}\n```\n\n[📝 提交错误报告]({issue_url})"
-    
-    return error_display
+        return f"{error_message}\n\n```\n{error_details}\n```\n\n[📝 提交错误报告]({issue_url})"
+    return f"{error_message}\n\n[📝 提交错误报告]({issue_url})"
 
 
 __all__ = [
@@ -3,23 +3,261 @@
 提供通用的网络请求重试功能，增强系统健壮性
 """
 
+import copy
 import time
-from functools import wraps
-from typing import Callable, Any
-import requests
+import random
+import threading
+import uuid
+import asyncio
+import inspect
+import importlib.util
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from collections import Counter
+from functools import wraps, lru_cache
+from typing import Callable, Any, Dict, Optional, Tuple, Type
 from loguru import logger
 
+# 支持的退避抖动策略
+JITTER_STRATEGIES = ("full", "decorrelated", "none")
+
+class RetryableError(Exception):
+    """自定义的可重试异常"""
+    pass
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态时直接抛出，不再请求已经不可用的上游服务"""
+    pass
+
+class CircuitBreaker:
+    """
+    熔断器：上游服务持续失败时快速失败，避免每个调用都完整走一遍退避重试
+    
+    失败按调用计数：一次调用用尽所有重试后才记一次失败，调用内部的单次重试不计入
+    
+    状态：
+        closed: 正常放行，累计连续失败的调用数
+        open: 连续失败达到阈值后进入，冷却期内的调用直接失败
+        half_open: 冷却期结束后只放行一个试探调用，成功则关闭，失败则重新打开
+    
+    不可重试的异常（如参数错误）既不算成功也不算失败：不关闭熔断器，只释放试探名额
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        return self._state
+    
+    def acquire(self) -> Tuple[bool, bool]:
+        """
+        判断当前调用是否可以发往上游
+        
+        Returns:
+            (是否放行, 是否为半开状态下的试探调用)；试探调用结束后必须调用 release_probe
+        """
+        # 快速路径：关闭状态下无需加锁
+        if self._state == self.CLOSED:
+            return True, False
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True, False
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False, False
+                self._state = self.HALF_OPEN
+            # 半开状态只放行一个试探调用
+            if self._probe_in_flight:
+                return False, False
+            self._probe_in_flight = True
+            return True, True
+    
+    def release_probe(self):
+        """
+        试探调用结束但没有记录结果（如不可重试的异常、被取消、KeyboardInterrupt）时释放试探名额，
+        否则熔断器会一直停留在半开状态，拒绝之后的所有调用
+        """
+        if not self._probe_in_flight:
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+    
+    def remaining_cooldown(self) -> float:
+        """距离允许试探调用还剩的秒数"""
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+    
+    def record_success(self):
+        """上游调用成功，关闭熔断器"""
+        # 快速路径：正常状态且无失败记录时无需加锁
+        if self._state == self.CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        """上游调用失败，达到阈值或试探失败时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("连续 {} 次调用失败，熔断 {:.0f} 秒", self._failures, self.cooldown)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+# 按函数共享的熔断器
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(key: str, config: "RetryConfig") -> Optional[CircuitBreaker]:
+    """
+    获取（或创建）指定键对应的熔断器
+    
+    Args:
+        key: 熔断器键，通常为被装饰函数的模块名 + 限定名
+        config: 重试配置，circuit_failure_threshold 为 None 时不使用熔断
+    
+    Returns:
+        熔断器实例，未启用熔断时返回 None
+    """
+    if config.circuit_failure_threshold is None:
+        return None
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(config.circuit_failure_threshold, config.circuit_cooldown)
+            _circuit_breakers[key] = breaker
+        return breaker
+
+@lru_cache(maxsize=None)
+def _find_sdk_retry_exceptions() -> tuple:
+    """
+    收集已安装的第三方SDK中表示临时故障（网络、超时、限流、服务端错误）的异常类型
+    
+    SDK为可选依赖，未安装时跳过
+    """
+    exceptions = []
+    if importlib.util.find_spec("openai") is not None:
+        import openai
+        exceptions.extend([
+            openai.APIConnectionError,  # 包含 APITimeoutError
+            openai.RateLimitError,
+            openai.InternalServerError,
+        ])
+    if importlib.util.find_spec("httpx") is not None:
+        import httpx
+        exceptions.append(httpx.HTTPError)
+    return tuple(exceptions)
+
+def __getattr__(name: str):
+    # SDK_RETRY_EXCEPTIONS（已安装SDK中的可重试异常类型）首次访问时才导入各SDK
+    if name == "SDK_RETRY_EXCEPTIONS":
+        return _find_sdk_retry_exceptions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 默认的可重试异常类型，首次使用时构建
+_DEFAULT_EXCEPTIONS: Optional[Tuple[Type[BaseException], ...]] = None
+
+def _default_retry_exceptions() -> Tuple[Type[BaseException], ...]:
+    """
+    默认需要重试的异常类型：只包含临时性故障，程序错误（KeyError、TypeError等）不重试
+    
+    requests 及各SDK导入开销较大，推迟到第一次需要匹配异常时再导入
+    """
+    global _DEFAULT_EXCEPTIONS
+    if _DEFAULT_EXCEPTIONS is None:
+        import requests
+        # 最常见的网络异常放在最前面，except 匹配时可以尽早命中
+        _DEFAULT_EXCEPTIONS = _collapse_exception_types((
+            requests.exceptions.RequestException,  # 已包含 ConnectionError、HTTPError、Timeout、TooManyRedirects
+            ConnectionError,
+            TimeoutError,
+            RetryableError,
+        ) + _find_sdk_retry_exceptions())  # OpenAI、httpx 等SDK的网络/限流/服务端异常
+    return _DEFAULT_EXCEPTIONS
+
+# 非幂等调用的可重试异常类型，首次使用时构建
+_UNSENT_REQUEST_EXCEPTIONS: Optional[Tuple[Type[BaseException], ...]] = None
+
+def _unsent_request_exceptions() -> Tuple[Type[BaseException], ...]:
+    """
+    非幂等调用（下单、计费等有副作用的请求）默认只重试连接阶段的失败，此时请求尚未到达服务端
+    
+    读超时、HTTP 错误响应等情况下服务端可能已经处理了请求，重试会造成重复执行
+    """
+    global _UNSENT_REQUEST_EXCEPTIONS
+    if _UNSENT_REQUEST_EXCEPTIONS is None:
+        import requests
+        exceptions = [
+            requests.exceptions.ConnectionError,  # 已包含 ConnectTimeout
+            ConnectionRefusedError,
+            RetryableError,
+        ]
+        if importlib.util.find_spec("httpx") is not None:
+            import httpx
+            exceptions.extend([httpx.ConnectError, httpx.ConnectTimeout])
+        _UNSENT_REQUEST_EXCEPTIONS = _collapse_exception_types(tuple(exceptions))
+    return _UNSENT_REQUEST_EXCEPTIONS
+
+def make_idempotency_key() -> str:
+    """
+    生成幂等键，调用方可放入请求头（如 Idempotency-Key），重试时沿用同一个键，由服务端去重
+    
+    Returns:
+        随机的 UUID 字符串
+    """
+    return str(uuid.uuid4())
+
+def _collapse_exception_types(exceptions: Tuple[Type[BaseException], ...]) -> Tuple[Type[BaseException], ...]:
+    """
+    去掉已被元组中其他类型覆盖的重复类型和子类，保持原有顺序
+    
+    except 语句按顺序逐个做 isinstance 检查，元组越短，匹配越快；
+    去掉子类不会改变能捕获的异常范围
+    """
+    unique = tuple(dict.fromkeys(exceptions))
+    return tuple(
+        exc for exc in unique
+        if not any(other is not exc and issubclass(exc, other) for other in unique)
+    )
+
 # 配置日志
 class RetryConfig:
     """重试配置类"""
     
+    __slots__ = (
+        "max_retries", "initial_delay", "backoff_factor", "max_delay",
+        "jitter", "jitter_factor", "circuit_failure_threshold", "circuit_cooldown",
+        "total_timeout", "idempotent", "delays", "_retry_on_exceptions",
+    )
+    
     def __init__(
         self,
         max_retries: int = 3,
         initial_delay: float = 1.0,
         backoff_factor: float = 2.0,
         max_delay: float = 60.0,
-        retry_on_exceptions: tuple = None
+        retry_on_exceptions: Optional[Tuple[Type[BaseException], ...]] = None,
+        jitter: str = "full",
+        jitter_factor: float = 1.0,
+        circuit_failure_threshold: Optional[int] = None,
+        circuit_cooldown: float = 30.0,
+        total_timeout: Optional[float] = None,
+        idempotent: bool = True
     ):
         """
         初始化重试配置
@@ -28,86 +266,612 @@ class RetryConfig:
             max_retries: 最大重试次数
             initial_delay: 初始延迟秒数
             backoff_factor: 退避因子（每次重试延迟翻倍）
-            max_delay: 最大延迟秒数
+            max_delay: 最大延迟秒数（服务端 Retry-After 要求的等待不受此限制）
             retry_on_exceptions: 需要重试的异常类型元组
+            jitter: 抖动策略，避免多个调用方同时重试造成的重试风暴
+                "full": 在 [delay * (1 - jitter_factor), delay] 内随机取值
+                "decorrelated": 在 [initial_delay, 上次延迟 * 3] 内随机取值，不低于初始延迟
+                "none": 不加抖动
+            jitter_factor: full 抖动时随机部分占延迟的比例（0~1）
+            circuit_failure_threshold: 连续多少次调用在用尽重试后仍失败时熔断（同一函数的所有调用共享），None 表示不熔断
+            circuit_cooldown: 熔断持续秒数，之后放行一次试探调用
+            total_timeout: 从首次调用开始计算的总耗时上限（秒），等待后会超出上限时不再重试，None 表示不限制
+            idempotent: 被装饰的调用是否可以安全地重复执行；为 False 且未指定 retry_on_exceptions 时，
+                只重试请求尚未到达服务端的连接失败
         """
+        if jitter not in JITTER_STRATEGIES:
+            raise ValueError(f"未知的抖动策略: {jitter}，可选值: {', '.join(JITTER_STRATEGIES)}")
+        
         self.max_retries = max_retries
         self.initial_delay = initial_delay
         self.backoff_factor = backoff_factor
         self.max_delay = max_delay
+        self.jitter = jitter
+        self.jitter_factor = jitter_factor
+        self.circuit_failure_threshold = circuit_failure_threshold
+        self.circuit_cooldown = circuit_cooldown
+        self.total_timeout = total_timeout
+        self.idempotent = idempotent
+        # 预先计算每次重试前的基础等待时间（抖动前），重试时直接按序号取值
+        self.delays = tuple(
+            min(initial_delay * (backoff_factor ** attempt), max_delay)
+            for attempt in range(max_retries)
+        )
+        
+        # 未指定时使用默认异常类型，首次访问 retry_on_exceptions 时才构建
+        self.retry_on_exceptions = retry_on_exceptions
+    
+    @property
+    def retry_on_exceptions(self) -> Tuple[Type[BaseException], ...]:
+        """需要重试的异常类型元组"""
+        if self._retry_on_exceptions is None:
+            return _default_retry_exceptions() if self.idempotent else _unsent_request_exceptions()
+        return self._retry_on_exceptions
+    
+    @retry_on_exceptions.setter
+    def retry_on_exceptions(self, exceptions: Optional[Tuple[Type[BaseException], ...]]):
+        self._retry_on_exceptions = None if exceptions is None else _collapse_exception_types(tuple(exceptions))
+    
+    def copy(self) -> "RetryConfig":
+        """返回配置的独立副本，修改副本不会影响共享的全局配置"""
+        return copy.copy(self)
+    
+    def next_delay(self, attempt: int, prev_delay: float, rng: random.Random) -> float:
+        """
+        计算第 attempt 次失败后的等待时间（已应用抖动）
+        
+        Args:
+            attempt: 当前尝试序号（从0开始）
+            prev_delay: 上一次的等待时间，decorrelated 抖动使用
+            rng: 随机数生成器
         
-        # 默认需要重试的异常类型
-        if retry_on_exceptions is None:
-            self.retry_on_exceptions = (
-                requests.exceptions.RequestException,
-                requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.TooManyRedirects,
-                ConnectionError,
-                TimeoutError,
-                Exception  # OpenAI和其他API可能抛出的一般异常
-            )
-        else:
-            self.retry_on_exceptions = retry_on_exceptions
+        Returns:
+            等待秒数
+        """
+        if self.jitter == "decorrelated":
+            return min(self.max_delay, rng.uniform(self.initial_delay, prev_delay * 3))
+        
+        delay = self.delays[attempt]
+        if self.jitter == "full":
+            delay -= rng.uniform(0, delay * self.jitter_factor)
+        return delay
 
 # 默认配置
 DEFAULT_RETRY_CONFIG = RetryConfig()
 
-def with_retry(config: RetryConfig = None):
+# 同一函数的单次重试日志最短间隔（秒），间隔内的重试只计数，由下一条日志汇总
+RETRY_LOG_INTERVAL = 60.0
+
+class RetryMetrics:
     """
-    重试装饰器
+    按函数统计的重试指标，线程安全
+    
+    指标：
+        retries: 重试次数（不含首次调用）
+        recovered: 重试后成功的调用数
+        exhausted: 所有尝试都失败的调用数
+        backoff_seconds: 累计退避等待秒数
+    """
+    
+    def __init__(self, log_interval: float = RETRY_LOG_INTERVAL):
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Counter] = {}
+        # 每个函数上次输出重试日志的时间及此后未输出日志的重试次数
+        self._last_logged: Dict[str, float] = {}
+        self._unlogged: Counter = Counter()
+    
+    def _counter(self, func_name: str) -> Counter:
+        counter = self._stats.get(func_name)
+        if counter is None:
+            counter = self._stats[func_name] = Counter()
+        return counter
+    
+    def record_retry(self, func_name: str, delay: float) -> Optional[int]:
+        """
+        记录一次重试
+        
+        Returns:
+            本次需要输出日志时返回上次日志以来未单独记录的重试次数，否则返回 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counter(func_name)
+            counter["retries"] += 1
+            counter["backoff_seconds"] += delay
+            last_logged = self._last_logged.get(func_name)
+            if last_logged is not None and now - last_logged < self.log_interval:
+                self._unlogged[func_name] += 1
+                return None
+            self._last_logged[func_name] = now
+            return self._unlogged.pop(func_name, 0)
+    
+    def record_outcome(self, func_name: str, recovered: bool):
+        """记录一次经过重试的调用的最终结果"""
+        with self._lock:
+            self._counter(func_name)["recovered" if recovered else "exhausted"] += 1
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """返回所有函数指标的副本"""
+        with self._lock:
+            return {name: dict(counter) for name, counter in self._stats.items()}
+    
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._stats.clear()
+            self._last_logged.clear()
+            self._unlogged.clear()
+
+_retry_metrics = RetryMetrics()
+
+def get_retry_stats() -> Dict[str, Dict[str, float]]:
+    """
+    获取各函数的重试统计
+    
+    Returns:
+        以函数名为键的指标字典，例如 {"LLMClient.invoke": {"retries": 3, "recovered": 1, ...}}
+    """
+    return _retry_metrics.snapshot()
+
+def _caller_kind(graceful: bool) -> str:
+    """日志中被装饰函数的称呼"""
+    return "非关键API" if graceful else "函数"
+
+# 日志使用 loguru 的延迟格式化（"{}" 占位符 + 参数），日志级别被过滤时不会格式化字符串
+def _log_retry_success(func_name: str, attempt: int, graceful: bool):
+    """记录重试后成功"""
+    _retry_metrics.record_outcome(func_name, recovered=True)
+    logger.info("{} {} 在第 {} 次尝试后成功", _caller_kind(graceful), func_name, attempt + 1)
+
+def _log_retry_attempt(func_name: str, attempt: int, error: Exception, delay: float, graceful: bool):
+    """记录单次失败及下一次重试的等待时间，同一函数每个 RETRY_LOG_INTERVAL 内只输出一次日志"""
+    unlogged = _retry_metrics.record_retry(func_name, delay)
+    if unlogged is None:
+        return
+    logger.warning("{} {} 第 {} 次尝试失败: {}", _caller_kind(graceful), func_name, attempt + 1, error)
+    if unlogged:
+        logger.warning("{} {} 上次日志后另有 {} 次重试未单独记录", _caller_kind(graceful), func_name, unlogged)
+    logger.info("将在 {:.1f} 秒后进行第 {} 次尝试...", delay, attempt + 2)
+
+def _on_retries_exhausted(func_name: str, attempts: int, error: Exception, graceful: bool, default_return):
+    """所有尝试都失败：普通模式抛出最后的异常，优雅模式返回默认值"""
+    _retry_metrics.record_outcome(func_name, recovered=False)
+    if not graceful:
+        logger.error("函数 {} 在 {} 次尝试后仍然失败", func_name, attempts)
+        logger.error("最终错误: {}", error)
+        raise error
+    logger.warning("非关键API {} 在 {} 次尝试后仍然失败", func_name, attempts)
+    logger.warning("最终错误: {}", error)
+    logger.info("返回默认值以保证系统继续运行: {}", default_return)
+    return default_return
+
+def _on_circuit_open(func_name: str, breaker: CircuitBreaker, graceful: bool, default_return):
+    """熔断期间的调用：普通模式抛出 CircuitOpenError，优雅模式返回默认值"""
+    message = f"{func_name} 的上游服务连续失败，已熔断，{breaker.remaining_cooldown():.0f} 秒后再试"
+    if not graceful:
+        raise CircuitOpenError(message)
+    logger.warning("非关键API {}", message)
+    return default_return
+
+def _retry_after_seconds(error: BaseException) -> float:
+    """
+    读取异常所带 HTTP 响应中的 Retry-After 头（429/503 限流时常见），返回服务端要求的等待秒数
+    
+    支持 requests.HTTPError、httpx.HTTPStatusError 以及 OpenAI SDK 的 RateLimitError 等带 response 属性的异常，
+    没有该头或无法解析时返回 0
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0.0
+    retry_after = headers.get("Retry-After")
+    if not retry_after:
+        return 0.0
+    # 秒数形式
+    try:
+        seconds = float(retry_after)
+    except ValueError:
+        pass
+    else:
+        return seconds if 0 < seconds < float("inf") else 0.0
+    # HTTP 日期形式
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return 0.0
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def _exceeds_deadline(deadline: Optional[float], delay: float) -> bool:
+    """等待 delay 秒后是否已没有剩余时间发起下一次尝试"""
+    return deadline is not None and time.monotonic() + delay >= deadline
+
+def _on_non_retryable(func_name: str, error: Exception, graceful: bool, default_return):
+    """不在重试列表中的异常：普通模式直接抛出，优雅模式返回默认值"""
+    if not graceful:
+        logger.error("函数 {} 遇到不可重试的异常: {}", func_name, error)
+        raise error
+    logger.warning("非关键API {} 遇到不可重试的异常: {}", func_name, error)
+    logger.info("返回默认值以保证系统继续运行: {}", default_return)
+    return default_return
+
+def _next_retry_delay(
+    func_name: str,
+    config: RetryConfig,
+    rng: random.Random,
+    attempt: int,
+    prev_delay: float,
+    error: Exception,
+    graceful: bool,
+    deadline: Optional[float]
+) -> Optional[Tuple[float, float]]:
+    """
+    决定第 attempt 次重试是否进行以及之前等待多久，同步与异步重试循环共用
     
     Args:
-        config: 重试配置，如果不提供则使用默认配置
+        func_name: 日志中使用的函数名
+        config: 重试配置
+        rng: 计算抖动使用的随机数生成器
+        attempt: 重试序号（从 0 开始）
+        prev_delay: 上一次的退避延迟（decorrelated 抖动使用）
+        error: 上一次尝试抛出的可重试异常
+        graceful: 日志中是否按非关键API记录
+        deadline: 总耗时截止时间（time.monotonic 时间，可选）
     
     Returns:
-        装饰器函数
+        (本次退避延迟, 实际等待秒数)；等待后会超出总耗时上限时返回 None，表示停止重试
     """
-    if config is None:
-        config = DEFAULT_RETRY_CONFIG
+    # 计算延迟时间（带抖动）
+    backoff = config.next_delay(attempt, prev_delay, rng)
+    # 服务端通过 Retry-After 指定了等待时间时，至少等待该时长（不受 max_delay 限制，由总耗时上限约束）
+    delay = max(backoff, _retry_after_seconds(error))
+    # 等待后已超出总耗时上限，不再重试
+    if _exceeds_deadline(deadline, delay):
+        return None
+    _log_retry_attempt(func_name, attempt, error, delay, graceful)
+    return backoff, delay
+
+def _retry_after_failure(
+    func: Callable,
+    func_name: str,
+    args: tuple,
+    kwargs: dict,
+    config: RetryConfig,
+    rng: random.Random,
+    error: Exception,
+    graceful: bool,
+    default_return=None,
+    breaker: Optional[CircuitBreaker] = None,
+    deadline: Optional[float] = None
+) -> Any:
+    """
+    首次调用失败后的同步重试循环
     
-    def decorator(func: Callable) -> Callable:
+    Args:
+        func: 要重试的函数
+        func_name: 日志中使用的函数名
+        args: 位置参数
+        kwargs: 关键字参数
+        config: 重试配置
+        rng: 计算抖动使用的随机数生成器
+        error: 首次调用抛出的可重试异常
+        graceful: 为 True 时所有重试失败后返回 default_return 而不是抛出异常
+        default_return: 优雅模式下的默认返回值
+        breaker: 熔断器（可选），记录整次调用的成功或失败（不可重试的异常不记录）
+        deadline: 总耗时截止时间（time.monotonic 时间，可选），超出前停止重试
+    
+    Returns:
+        函数的返回值（或优雅模式下的默认值）
+    """
+    prev_delay = config.initial_delay
+    attempts = 1
+    for attempt in range(config.max_retries):
+        step = _next_retry_delay(func_name, config, rng, attempt, prev_delay, error, graceful, deadline)
+        if step is None:
+            break
+        prev_delay, delay = step
+        time.sleep(delay)
+        
+        attempts += 1
+        try:
+            result = func(*args, **kwargs)
+        except config.retry_on_exceptions as e:
+            error = e
+            continue
+        except Exception as e:
+            return _on_non_retryable(func_name, e, graceful, default_return)
+        if breaker is not None:
+            breaker.record_success()
+        _log_retry_success(func_name, attempt + 1, graceful)
+        return result
+    
+    # 最后一次尝试也失败了，整次调用计为一次失败
+    if breaker is not None:
+        breaker.record_failure()
+    return _on_retries_exhausted(func_name, attempts, error, graceful, default_return)
+
+async def _async_retry_after_failure(
+    func: Callable,
+    func_name: str,
+    args: tuple,
+    kwargs: dict,
+    config: RetryConfig,
+    rng: random.Random,
+    error: Exception,
+    graceful: bool,
+    default_return=None,
+    breaker: Optional[CircuitBreaker] = None,
+    deadline: Optional[float] = None
+) -> Any:
+    """
+    首次调用失败后的异步重试循环，与 _retry_after_failure 共用 _next_retry_delay，只有调用和退避等待改为 await
+    
+    Args:
+        func: 要重试的协程函数
+        func_name: 日志中使用的函数名
+        args: 位置参数
+        kwargs: 关键字参数
+        config: 重试配置
+        rng: 计算抖动使用的随机数生成器
+        error: 首次调用抛出的可重试异常
+        graceful: 为 True 时所有重试失败后返回 default_return 而不是抛出异常
+        default_return: 优雅模式下的默认返回值
+        breaker: 熔断器（可选），记录整次调用的成功或失败（不可重试的异常不记录）
+        deadline: 总耗时截止时间（time.monotonic 时间，可选），超出前停止重试
+    
+    Returns:
+        函数的返回值（或优雅模式下的默认值）
+    """
+    prev_delay = config.initial_delay
+    attempts = 1
+    for attempt in range(config.max_retries):
+        step = _next_retry_delay(func_name, config, rng, attempt, prev_delay, error, graceful, deadline)
+        if step is None:
+            break
+        prev_delay, delay = step
+        await asyncio.sleep(delay)
+        
+        attempts += 1
+        try:
+            result = await func(*args, **kwargs)
+        except config.retry_on_exceptions as e:
+            error = e
+            continue
+        except Exception as e:
+            return _on_non_retryable(func_name, e, graceful, default_return)
+        if breaker is not None:
+            breaker.record_success()
+        _log_retry_success(func_name, attempt + 1, graceful)
+        return result
+    
+    # 最后一次尝试也失败了，整次调用计为一次失败
+    if breaker is not None:
+        breaker.record_failure()
+    return _on_retries_exhausted(func_name, attempts, error, graceful, default_return)
+
+def _build_retry_wrapper(func: Callable, config: RetryConfig, graceful: bool, default_return=None) -> Callable:
+    """
+    为函数构建重试包装，with_retry 与 with_graceful_retry 共用
+    
+    Args:
+        func: 被装饰的函数（普通函数或协程函数）
+        config: 重试配置
+        graceful: 为 True 时所有重试失败后返回 default_return 而不是抛出异常
+        default_return: 优雅模式下的默认返回值
+    
+    Returns:
+        包装后的函数
+    """
+    # 包装函数持有配置快照，之后修改共享的全局配置不会影响已装饰的函数
+    config = config.copy()
+    # 每个被装饰函数独立的随机数生成器，避免共享全局随机状态
+    rng = random.Random()
+    func_name = func.__qualname__
+    # 同一函数的所有调用共享一个熔断器（未启用时为 None）
+    breaker = get_circuit_breaker(f"{func.__module__}.{func.__qualname__}", config)
+    # 装饰时确定是否需要截止时间，首次调用的快速路径上不再读取配置
+    total_timeout = config.total_timeout
+    
+    # 协程函数使用异步包装，退避期间不阻塞事件循环
+    if inspect.iscoroutinefunction(func):
         @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            last_exception = None
+        async def async_wrapper(*args, **kwargs) -> Any:
+            probe = False
+            if breaker is not None:
+                allowed, probe = breaker.acquire()
+                if not allowed:
+                    return _on_circuit_open(func_name, breaker, graceful, default_return)
+            deadline = None if total_timeout is None else time.monotonic() + total_timeout
             
-            for attempt in range(config.max_retries + 1):  # +1 因为第一次不算重试
+            try:
+                # 快速路径：首次调用成功时不进入重试循环
                 try:
-                    result = func(*args, **kwargs)
-                    if attempt > 0:
-                        logger.info(f"函数 {func.__name__} 在第 {attempt + 1} 次尝试后成功")
-                    return result
-                    
+                    result = await func(*args, **kwargs)
                 except config.retry_on_exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == config.max_retries:
-                        # 最后一次尝试也失败了
-                        logger.error(f"函数 {func.__name__} 在 {config.max_retries + 1} 次尝试后仍然失败")
-                        logger.error(f"最终错误: {str(e)}")
-                        raise e
-                    
-                    # 计算延迟时间
-                    delay = min(
-                        config.initial_delay * (config.backoff_factor ** attempt),
-                        config.max_delay
-                    )
-                    
-                    logger.warning(f"函数 {func.__name__} 第 {attempt + 1} 次尝试失败: {str(e)}")
-                    logger.info(f"将在 {delay:.1f} 秒后进行第 {attempt + 2} 次尝试...")
-                    
-                    time.sleep(delay)
-                
+                    return await _async_retry_after_failure(func, func_name, args, kwargs, config, rng, e, graceful, default_return, breaker, deadline)
                 except Exception as e:
-                    # 不在重试列表中的异常，直接抛出
-                    logger.error(f"函数 {func.__name__} 遇到不可重试的异常: {str(e)}")
-                    raise e
-            
-            # 这里不应该到达，但作为安全网
-            if last_exception:
-                raise last_exception
+                    # 不可重试的异常不说明上游已恢复，不关闭熔断器，试探名额在 finally 中释放
+                    return _on_non_retryable(func_name, e, graceful, default_return)
+                if breaker is not None:
+                    breaker.record_success()
+                return result
+            finally:
+                # 试探调用被取消等情况下也要释放试探名额
+                if probe:
+                    breaker.release_probe()
+        
+        return async_wrapper
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        probe = False
+        if breaker is not None:
+            allowed, probe = breaker.acquire()
+            if not allowed:
+                return _on_circuit_open(func_name, breaker, graceful, default_return)
+        deadline = None if total_timeout is None else time.monotonic() + total_timeout
+        
+        try:
+            # 快速路径：首次调用成功时不进入重试循环
+            try:
+                result = func(*args, **kwargs)
+            except config.retry_on_exceptions as e:
+                return _retry_after_failure(func, func_name, args, kwargs, config, rng, e, graceful, default_return, breaker, deadline)
+            except Exception as e:
+                # 不可重试的异常不说明上游已恢复，不关闭熔断器，试探名额在 finally 中释放
+                return _on_non_retryable(func_name, e, graceful, default_return)
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        finally:
+            # 试探调用被中断（KeyboardInterrupt、GreenletExit 等）时也要释放试探名额
+            if probe:
+                breaker.release_probe()
+    
+    return wrapper
+
+class _InFlightCall:
+    """同步调用的在途记录，跟随者等待领头调用完成后共享其结果"""
+    
+    __slots__ = ("done", "result", "error")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _waiter_error(error: BaseException) -> BaseException:
+    """
+    为同步合并调用的等待者生成要抛出的异常
+    
+    多个线程重新抛出同一个异常对象时会互相改写它的 __traceback__，
+    因此每个等待者抛出一个副本，并通过 __cause__ 保留领头调用的原始 traceback
+    """
+    try:
+        waiter_error = copy.copy(error)
+    except Exception:
+        # 无法按构造参数重建的异常只能共享原对象，去掉领头调用的 traceback 后再抛出
+        return error.with_traceback(None)
+    waiter_error.__cause__ = error
+    return waiter_error
+
+class _AsyncInFlightCall:
+    """异步调用的在途记录：共享的重试循环在独立任务中运行，各调用方分别等待"""
+    
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+def _coalesce_key(args: tuple, kwargs: dict):
+    """生成在途调用的合并键，参数不可哈希时返回 None（不合并）"""
+    key = (args, frozenset(kwargs.items())) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _build_coalescing_wrapper(wrapper: Callable) -> Callable:
+    """
+    合并相同参数的在途调用：已有相同调用在执行时直接等待其结果，
+    而不是再启动一个并行的重试循环，避免上游变慢时重试流量成倍放大
+    
+    共享调用抛出的异常同样会抛给所有等待者（同步调用的等待者各自抛出一个副本）；异步调用方被取消时只影响自己，
+    共享调用在还有其他等待者时继续执行
+    
+    Args:
+        wrapper: 已带重试逻辑的包装函数
+    
+    Returns:
+        合并在途调用后的包装函数
+    """
+    if inspect.iscoroutinefunction(wrapper):
+        pending_calls: Dict[Any, _AsyncInFlightCall] = {}
+        
+        @wraps(wrapper)
+        async def async_coalescing_wrapper(*args, **kwargs) -> Any:
+            key = _coalesce_key(args, kwargs)
+            if key is None:
+                return await wrapper(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            # 键中带上事件循环，任务不能跨循环等待
+            key = (id(loop), key)
+            call = pending_calls.get(key)
+            if call is None:
+                # 共享的调用放在独立任务中运行，不随某个调用方的取消而取消
+                call = pending_calls[key] = _AsyncInFlightCall(loop.create_task(wrapper(*args, **kwargs)))
+                
+                def _forget(_task, key=key, call=call):
+                    if pending_calls.get(key) is call:
+                        del pending_calls[key]
+                call.task.add_done_callback(_forget)
             
+            call.waiters += 1
+            try:
+                return await asyncio.shield(call.task)
+            finally:
+                call.waiters -= 1
+                # 所有调用方都已放弃等待时取消共享调用
+                if call.waiters == 0 and not call.task.done():
+                    call.task.cancel()
+        
+        return async_coalescing_wrapper
+    
+    pending_calls: Dict[Any, _InFlightCall] = {}
+    lock = threading.Lock()
+    
+    @wraps(wrapper)
+    def coalescing_wrapper(*args, **kwargs) -> Any:
+        key = _coalesce_key(args, kwargs)
+        if key is None:
+            return wrapper(*args, **kwargs)
+        with lock:
+            call = pending_calls.get(key)
+            leader = call is None
+            if leader:
+                call = pending_calls[key] = _InFlightCall()
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise _waiter_error(call.error)
+            return call.result
+        
+        try:
+            call.result = wrapper(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with lock:
+                pending_calls.pop(key, None)
+            call.done.set()
+    
+    return coalescing_wrapper
+
+def with_retry(config: RetryConfig = None, coalesce: bool = False):
+    """
+    重试装饰器
+    
+    Args:
+        config: 重试配置，如果不提供则使用默认配置
+        coalesce: 为 True 时合并相同参数的在途调用，共享同一个重试循环的结果
+    
+    Returns:
+        装饰器函数
+    """
+    if config is None:
+        config = DEFAULT_RETRY_CONFIG
+    
+    def decorator(func: Callable) -> Callable:
+        wrapper = _build_retry_wrapper(func, config, graceful=False)
+        if coalesce:
+            wrapper = _build_coalescing_wrapper(wrapper)
         return wrapper
     return decorator
 
@@ -134,10 +898,6 @@ def retry_on_network_error(
     )
     return with_retry(config)
 
-class RetryableError(Exception):
-    """自定义的可重试异常"""
-    pass
-
 def with_graceful_retry(config: RetryConfig = None, default_return=None):
     """
     优雅重试装饰器 - 用于非关键API调用
@@ -154,50 +914,47 @@ def with_graceful_retry(config: RetryConfig = None, default_return=None):
         config = SEARCH_API_RETRY_CONFIG
     
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            last_exception = None
-            
-            for attempt in range(config.max_retries + 1):  # +1 因为第一次不算重试
-                try:
-                    result = func(*args, **kwargs)
-                    if attempt > 0:
-                        logger.info(f"非关键API {func.__name__} 在第 {attempt + 1} 次尝试后成功")
-                    return result
-                    
-                except config.retry_on_exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == config.max_retries:
-                        # 最后一次尝试也失败了，返回默认值而不抛出异常
-                        logger.warning(f"非关键API {func.__name__} 在 {config.max_retries + 1} 次尝试后仍然失败")
-                        logger.warning(f"最终错误: {str(e)}")
-                        logger.info(f"返回默认值以保证系统继续运行: {default_return}")
-                        return default_return
-                    
-                    # 计算延迟时间
-                    delay = min(
-                        config.initial_delay * (config.backoff_factor ** attempt),
-                        config.max_delay
-                    )
-                    
-                    logger.warning(f"非关键API {func.__name__} 第 {attempt + 1} 次尝试失败: {str(e)}")
-                    logger.info(f"将在 {delay:.1f} 秒后进行第 {attempt + 2} 次尝试...")
-                    
-                    time.sleep(delay)
-                
-                except Exception as e:
-                    # 不在重试列表中的异常，返回默认值
-                    logger.warning(f"非关键API {func.__name__} 遇到不可重试的异常: {str(e)}")
-                    logger.info(f"返回默认值以保证系统继续运行: {default_return}")
-                    return default_return
-            
-            # 这里不应该到达，但作为安全网
-            return default_return
-            
-        return wrapper
+        return _build_retry_wrapper(func, config, graceful=True, default_return=default_return)
     return decorator
 
+def async_with_retry(config: RetryConfig = None, coalesce: bool = False):
+    """
+    异步重试装饰器，用于 async def 函数，退避时使用 await asyncio.sleep
+    
+    with_retry 会自动识别协程函数，此函数用于在调用处显式标明异步语义
+    
+    Args:
+        config: 重试配置，如果不提供则使用默认配置
+        coalesce: 为 True 时合并相同参数的在途调用，共享同一个重试循环的结果
+    
+    Returns:
+        装饰器函数
+    """
+    return with_retry(config, coalesce)
+
+def async_with_graceful_retry(config: RetryConfig = None, default_return=None):
+    """
+    异步优雅重试装饰器，用于 async def 函数，失败后返回默认值
+    
+    with_graceful_retry 会自动识别协程函数，此函数用于在调用处显式标明异步语义
+    
+    Args:
+        config: 重试配置，如果不提供则使用默认配置
+        default_return: 所有重试失败后返回的默认值
+    
+    Returns:
+        装饰器函数
+    """
+    return with_graceful_retry(config, default_return)
+
+@lru_cache(maxsize=None)
+def _request_retry_config(max_retries: int) -> RetryConfig:
+    """按重试次数缓存 make_retryable_request 使用的配置"""
+    return RetryConfig(max_retries=max_retries)
+
+# make_retryable_request 共用的随机数生成器
+_request_rng = random.Random()
+
 def make_retryable_request(
     request_func: Callable,
     *args,
@@ -216,27 +973,49 @@ def make_retryable_request(
     Returns:
         请求函数的返回值
     """
-    config = RetryConfig(max_retries=max_retries)
-    
-    @with_retry(config)
-    def _execute():
+    # 复用缓存的配置并直接执行重试循环，不在每次调用时构建装饰器
+    config = _request_retry_config(max_retries)
+    func_name = getattr(request_func, "__qualname__", repr(request_func))
+    try:
         return request_func(*args, **kwargs)
-    
-    return _execute()
+    except config.retry_on_exceptions as e:
+        return _retry_after_failure(request_func, func_name, args, kwargs, config, _request_rng, e, graceful=False)
+    except Exception as e:
+        return _on_non_retryable(func_name, e, graceful=False, default_return=None)
 
 # 预定义一些常用的重试配置
 LLM_RETRY_CONFIG = RetryConfig(
     max_retries=6,        # 保持额外重试次数
     initial_delay=60.0,   # 首次等待至少 1 分钟
     backoff_factor=2.0,   # 继续使用指数退避
-    max_delay=600.0       # 单次等待最长 10 分钟
+    max_delay=600.0,      # 单次等待最长 10 分钟
+    jitter="decorrelated",# 抖动后的等待时间仍不低于初始延迟
+    total_timeout=900.0,  # 包括重试在内最长 15 分钟
+    circuit_failure_threshold=5,  # 连续 5 次调用用尽重试仍失败后熔断
+    circuit_cooldown=30.0         # 熔断 30 秒后放行一次试探调用
+)
+
+# 有副作用的 LLM 调用（如会产生费用的创建类接口）：只在请求未发出时重试
+LLM_MUTATING_RETRY_CONFIG = RetryConfig(
+    max_retries=6,
+    initial_delay=60.0,
+    backoff_factor=2.0,
+    max_delay=600.0,
+    jitter="decorrelated",
+    total_timeout=900.0,
+    circuit_failure_threshold=5,
+    circuit_cooldown=30.0,
+    idempotent=False
 )
 
 SEARCH_API_RETRY_CONFIG = RetryConfig(
     max_retries=5,        # 增加到5次重试
     initial_delay=2.0,    # 增加初始延迟
     backoff_factor=1.6,   # 调整退避因子
-    max_delay=25.0        # 增加最大延迟
+    max_delay=25.0,       # 增加最大延迟
+    total_timeout=120.0,  # Retry-After 要求的等待超出 2 分钟时直接返回默认值
+    circuit_failure_threshold=5,  # 搜索服务持续不可用时快速返回默认值
+    circuit_cooldown=30.0
 )
 
 DB_RETRY_CONFIG = RetryConfig(